@@ -4,21 +4,29 @@ Click2GO – LangGraph Agentic Orchestrator
 Pipeline:
   START
     └─► scrape_pois      (Xiaohongshu discovery)
-          └─► verify_pois    (Claude verification loop)
+          └─► verify_one ×N  (one Send per POI, Claude verification)
+                └─► verify_pois   (merge fan-out results in scrape order)
                 └─► filter_pois   (drop rejected/closed POIs)
                       ├─[enough] ─► optimize_route  (K-Means clustering)
                       └─[retry]  ─► scrape_pois      (broader search fallback)
-                                        └─► verify_pois → filter_pois
+                                        └─► verify_one ×N → verify_pois → filter_pois
                                                 └─► optimize_route
                                                       └─► generate_output
                                                             └─► END
 """
+import asyncio
+import heapq
+import re
 import uuid
-from datetime import datetime
-from typing import List, Optional, TypedDict
+from datetime import date
+from types import MappingProxyType
+from typing import Annotated, AsyncIterator, List, Optional, TypedDict
 
+import numpy as np
 from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
 
+from ..clients import close_clients
 from ..tools.social_scraper_tool import SocialScraperTool
 from ..tools.map_tool import MapTool
 from ..agents.verification_agent import VerificationAgent
@@ -26,6 +34,25 @@ from ..services.route_optimizer import RouteOptimizer
 from ..tools.itinerary_exporter import ItineraryExporter
 
 
+# Characters ignored when comparing POI names (whitespace, punctuation, emoji)
+_NAME_NOISE_RE = re.compile(r"[\W_]+")
+
+
+def _name_fingerprint(name: str) -> str:
+    """Normalised POI name used to spot near-duplicates across queries."""
+    return _NAME_NOISE_RE.sub("", name).casefold() or name
+
+
+def _collect_results(left: Optional[list], right: Optional[list]) -> list:
+    """
+    Reducer for per-POI verification results written by parallel ``Send``
+    tasks. ``None`` clears the list, so a retry scrape starts afresh.
+    """
+    if right is None:
+        return []
+    return (left or []) + right
+
+
 # ── State definition ─────────────────────────────────────────────────────────
 
 class PlanningState(TypedDict):
@@ -35,11 +62,16 @@ class PlanningState(TypedDict):
     start_date: str
     end_date: str
     personas: List[str]      # one or more: ["photography", "foodie", ...]
+    persona_label: str       # "photography & foodie" – verification prompt / cache key
+    persona_display: str     # "Photography & Foodie" – PDF / map headers
+    persona_keywords: List[str]   # search keyword per known persona
     constraints: dict
     max_pois_per_day: int
+    days_total: int          # trip length, derived once from the dates
 
     # Pipeline data
     raw_pois: List[dict]
+    verification_results: Annotated[List[dict], _collect_results]   # fan-out scratch
     verified_pois: List[dict]
     rejected_pois: List[dict]
     clustered_days: List[List[dict]]
@@ -57,17 +89,31 @@ class PlanningState(TypedDict):
 
 # ── Orchestrator ──────────────────────────────────────────────────────────────
 
+class VerifyTask(TypedDict):
+    """Payload of one ``verify_one`` fan-out task."""
+    index: int               # position in raw_pois, to restore scrape order
+    poi: dict
+    persona: str
+    start_date: str
+    end_date: str
+
+
 class TravelPlanningOrchestrator:
     """
     Stateful agentic travel planner implemented as a LangGraph StateGraph.
     """
 
-    PERSONA_KEYWORDS = {
-        "photography": ["拍照打卡", "摄影景点", "ins风"],
-        "chilling":    ["咖啡厅", "休闲", "氛围感"],
-        "foodie":      ["美食推荐", "必吃", "特色小吃"],
-        "exercise":    ["徒步", "户外运动", "骑行"],
-    }
+    PERSONA_KEYWORDS = MappingProxyType({
+        "photography": ("拍照打卡", "摄影景点", "ins风"),
+        "chilling":    ("咖啡厅", "休闲", "氛围感"),
+        "foodie":      ("美食推荐", "必吃", "特色小吃"),
+        "exercise":    ("徒步", "户外运动", "骑行"),
+    })
+
+    # Upper bounds on concurrent upstream calls, to respect Xiaohongshu / Claude rate limits.
+    # VERIFY_CONCURRENCY is enforced by LangGraph as the run's max_concurrency.
+    SCRAPE_CONCURRENCY = 3
+    VERIFY_CONCURRENCY = 8
 
     def __init__(self):
         self.scraper  = SocialScraperTool()
@@ -83,13 +129,17 @@ class TravelPlanningOrchestrator:
         wf = StateGraph(PlanningState)
 
         wf.add_node("scrape_pois",     self._scrape_pois)
+        wf.add_node("verify_one",      self._verify_single_poi)
         wf.add_node("verify_pois",     self._verify_pois)
         wf.add_node("filter_pois",     self._filter_pois)
         wf.add_node("optimize_route",  self._optimize_route)
         wf.add_node("generate_output", self._generate_output)
 
         wf.add_edge(START,            "scrape_pois")
-        wf.add_edge("scrape_pois",    "verify_pois")
+        wf.add_conditional_edges(
+            "scrape_pois", self._fan_out_verification, ["verify_one", "verify_pois"]
+        )
+        wf.add_edge("verify_one",     "verify_pois")
         wf.add_edge("verify_pois",    "filter_pois")
         wf.add_conditional_edges(
             "filter_pois",
@@ -107,27 +157,32 @@ class TravelPlanningOrchestrator:
 
     # ── Node implementations ──────────────────────────────────────────────────
 
-    def _scrape_pois(self, state: PlanningState) -> dict:
+    async def _scrape_pois(self, state: PlanningState) -> dict:
         destination = state["destination"]
-        personas    = state["personas"]          # now a list
         attempt     = state.get("scrape_attempts", 0) + 1
 
         # Build one general query + one per selected persona
-        queries = [f"{destination}旅游攻略"]
-        for p in personas:
-            kw = self.PERSONA_KEYWORDS.get(p, [""])[0]
-            if kw:
-                queries.append(f"{destination}{kw}")
+        queries = [f"{destination}旅游攻略"] + [f"{destination}{kw}" for kw in state["persona_keywords"]]
         if attempt > 1:
             queries.append(f"{destination}景点推荐")
 
+        sem = asyncio.Semaphore(self.SCRAPE_CONCURRENCY)
+
+        async def search(q: str) -> List[dict]:
+            async with sem:
+                return await self.scraper.search_pois_async(q, max_results=15)
+
+        results_per_query = await asyncio.gather(*(search(q) for q in queries))
+
+        # Merge in query order, dropping names that only differ by spacing,
+        # punctuation or case so they don't waste a verification slot.
         raw_pois: List[dict] = []
         seen: set = set()
-        for q in queries:
-            results = self.scraper.search_pois(q, max_results=15)
+        for results in results_per_query:
             for p in results:
-                if p["name"] not in seen:
-                    seen.add(p["name"])
+                fp = _name_fingerprint(p["name"])
+                if fp not in seen:
+                    seen.add(fp)
                     raw_pois.append(p)
 
         # Cap at 20 candidates
@@ -135,6 +190,7 @@ class TravelPlanningOrchestrator:
 
         return {
             "raw_pois":       raw_pois,
+            "verification_results": None,        # reset the fan-out accumulator
             "scrape_attempts": attempt,
             "status":         "scraping_complete",
             "stats": {
@@ -143,48 +199,76 @@ class TravelPlanningOrchestrator:
             },
         }
 
-    def _verify_pois(self, state: PlanningState) -> dict:
-        raw_pois   = state["raw_pois"]
-        personas   = state["personas"]
-        persona    = " & ".join(personas)        # e.g. "photography & foodie"
-        start_date = state["start_date"]
-        end_date   = state["end_date"]
-
-        verified: List[dict] = []
-
-        for poi in raw_pois:
-            # Fetch 5 most-recent posts for "Reality Check"
-            recent = self.scraper.get_recent_posts(poi["name"], num_posts=5)
-            posts  = [p.get("content", "") for p in recent if p.get("content")]
-
-            result = self.verifier.verify(
-                poi_name=poi["name"],
-                recent_posts=posts,
-                persona=persona,
-                start_date=start_date,
-                end_date=end_date,
-            )
-
-            # Geocode while we're here
-            if poi.get("address") and not poi.get("lat"):
-                coords = self.map_tool.geocode(poi["address"])
-                if coords:
-                    poi["lat"], poi["lng"] = coords
-
-            # Prefer AI-returned score; fall back to score embedded by scraper mock data
-            ai_score = result.get("persona_score")
-            score = ai_score if (ai_score is not None and ai_score != 5.0) \
-                    else poi.get("persona_score", ai_score or 5.0)
-
-            verified.append({
-                **poi,
-                "is_open":                   result.get("is_open"),
-                "seasonal_match":            result.get("seasonal_match"),
-                "persona_score":             score,
-                "recommendation":            result.get("recommendation", "INCLUDE"),
-                "reasoning":                 result.get("reasoning", ""),
-                "agent_note":                result.get("agent_note", ""),
+    def _fan_out_verification(self, state: PlanningState):
+        """
+        Emit one ``verify_one`` task per scraped POI. LangGraph runs them
+        concurrently (bounded by the run's ``max_concurrency``). With
+        nothing to verify – or no API key to verify with – go straight to
+        the merge step, skipping the per-POI post fetches.
+        """
+        raw_pois = state["raw_pois"]
+        if not raw_pois or not self.verifier.has_api_key():
+            return "verify_pois"
+
+        persona = state["persona_label"]
+        return [
+            Send("verify_one", {
+                "index":      i,
+                "poi":        poi,
+                "persona":    persona,
+                "start_date": state["start_date"],
+                "end_date":   state["end_date"],
             })
+            for i, poi in enumerate(raw_pois)
+        ]
+
+    async def _verify_single_poi(self, task: VerifyTask) -> dict:
+        poi = dict(task["poi"])
+
+        # Posts + Claude and the geocode are independent network calls
+        verify = self._verify_one(poi, task["persona"], task["start_date"], task["end_date"])
+        try:
+            if poi.get("address") and poi.get("lat") is None:
+                result, ll = await asyncio.gather(verify, self.map_tool.geocode_async(poi["address"]))
+            else:
+                result, ll = await verify, None
+        except Exception as exc:
+            # One failing POI must not abort the whole fan-out
+            result, ll = VerificationAgent._fallback(poi["name"], reason=str(exc)), None
+        if ll:
+            poi["lat"], poi["lng"] = ll
+
+        merged = self._merge_verification(poi, result)
+        return {"verification_results": [{"index": task["index"], "poi": merged}]}
+
+    async def _verify_one(
+        self,
+        poi: dict,
+        persona: str,
+        start_date: str,
+        end_date: str,
+    ) -> dict:
+        # Fetch 5 most-recent posts for "Reality Check"
+        recent = await self.scraper.get_recent_posts_async(poi["name"], num_posts=5)
+        posts  = [p.get("content", "") for p in recent if p.get("content")]
+
+        return await self.verifier.verify_async(
+            poi_name=poi["name"],
+            recent_posts=posts,
+            persona=persona,
+            start_date=start_date,
+            end_date=end_date,
+        )
+
+    async def _verify_pois(self, state: PlanningState) -> dict:
+        if state.get("verification_results") or not state["raw_pois"]:
+            # Fan-out tasks finish in any order; restore the scrape order
+            results  = sorted(state.get("verification_results") or [], key=lambda r: r["index"])
+            verified = [r["poi"] for r in results]
+        else:
+            # No API key: the fan-out was skipped. Include everything
+            # unverified, but still geocode so the map can be drawn.
+            verified = await self._unverified_pois(state["raw_pois"])
 
         return {
             "verified_pois": verified,
@@ -192,24 +276,63 @@ class TravelPlanningOrchestrator:
             "stats": {
                 **state.get("stats", {}),
                 "total_verified": len(verified),
+                "verify_cache_hits":   self.verifier.cache_hits,
+                "verify_cache_misses": self.verifier.cache_misses,
             },
         }
 
+    async def _unverified_pois(self, raw_pois: List[dict]) -> List[dict]:
+        pois = [dict(p) for p in raw_pois]
+        to_geocode = [p for p in pois if p.get("address") and p.get("lat") is None]
+        coords = await self.map_tool.geocode_batch([p["address"] for p in to_geocode])
+        for poi, ll in zip(to_geocode, coords):
+            if ll:
+                poi["lat"], poi["lng"] = ll
+
+        return [
+            self._merge_verification(poi, VerificationAgent._fallback(poi["name"], reason="no_api_key"))
+            for poi in pois
+        ]
+
+    @staticmethod
+    def _merge_verification(poi: dict, result: dict) -> dict:
+        # Prefer AI-returned score; fall back to score embedded by scraper mock data
+        ai_score = result.get("persona_score")
+        score = ai_score if (ai_score is not None and ai_score != 5.0) \
+                else poi.get("persona_score", ai_score or 5.0)
+
+        return {
+            **poi,
+            "is_open":                   result.get("is_open"),
+            "seasonal_match":            result.get("seasonal_match"),
+            "persona_score":             score,
+            "recommendation":            result.get("recommendation", "INCLUDE"),
+            "reasoning":                 result.get("reasoning", ""),
+            "agent_note":                result.get("agent_note", ""),
+        }
+
     def _filter_pois(self, state: PlanningState) -> dict:
         verified = state["verified_pois"]
 
-        included = [
-            p for p in verified
-            if p.get("recommendation") != "EXCLUDE"
-            and p.get("is_open") is not False
-        ]
-        rejected = [p for p in verified if p not in included]
-
-        # Sort by persona alignment score (descending)
-        included.sort(key=lambda p: p.get("persona_score", 0), reverse=True)
+        # Single pass; avoids the O(N²) dict-equality scan of `p not in included`
+        included: List[dict] = []
+        rejected: List[dict] = []
+        for p in verified:
+            if p.get("recommendation") != "EXCLUDE" and p.get("is_open") is not False:
+                included.append(p)
+            else:
+                rejected.append(p)
+
+        # Routing only places days × max_per_day stops, so keep just the
+        # best-scoring ones (O(N log K) heap, not a full sort). The slack
+        # leaves the route optimizer room for geographic swaps, and the
+        # floor never trims below what _check_sufficiency asks for.
+        days = state.get("days_total", 3)
+        keep = max(days * state.get("max_pois_per_day", 5) + 4, self._min_pois_needed(days))
+        top  = heapq.nlargest(keep, included, key=lambda p: p.get("persona_score", 0))
 
         return {
-            "verified_pois": included,
+            "verified_pois": top,
             "rejected_pois": rejected,
             "status":        "filtering_complete",
             "stats": {
@@ -219,19 +342,14 @@ class TravelPlanningOrchestrator:
             },
         }
 
+    @staticmethod
+    def _min_pois_needed(days: int) -> int:
+        return max(days * 2, 4)
+
     def _check_sufficiency(self, state: PlanningState) -> str:
         included = state.get("verified_pois", [])
-        try:
-            days = (
-                datetime.strptime(state["end_date"],   "%Y-%m-%d")
-                - datetime.strptime(state["start_date"], "%Y-%m-%d")
-            ).days + 1
-        except Exception:
-            days = 3
 
-        min_needed = max(days * 2, 4)
-
-        if len(included) >= min_needed:
+        if len(included) >= self._min_pois_needed(state["days_total"]):
             return "ok"
         if state.get("scrape_attempts", 0) >= 2:
             return "force"          # proceed with whatever we have
@@ -240,21 +358,22 @@ class TravelPlanningOrchestrator:
     def _optimize_route(self, state: PlanningState) -> dict:
         included = state["verified_pois"]
         max_per_day = state.get("max_pois_per_day", 5)
+        days        = state["days_total"]
 
-        try:
-            days = (
-                datetime.strptime(state["end_date"],   "%Y-%m-%d")
-                - datetime.strptime(state["start_date"], "%Y-%m-%d")
-            ).days + 1
-        except Exception:
-            days = 3
-
-        geocoded   = [p for p in included if p.get("lat") and p.get("lng")]
-        ungeocoded = [p for p in included if not (p.get("lat") and p.get("lng"))]
+        # Coordinates of 0.0 (equator / prime meridian) are valid: test for None
+        geocoded, ungeocoded = [], []
+        for p in included:
+            has_coords = p.get("lat") is not None and p.get("lng") is not None
+            (geocoded if has_coords else ungeocoded).append(p)
 
         if geocoded:
+            n = len(geocoded)
+            coords = np.column_stack((
+                np.fromiter((p["lat"] for p in geocoded), dtype=np.float64, count=n),
+                np.fromiter((p["lng"] for p in geocoded), dtype=np.float64, count=n),
+            ))
             clustered = self.optimizer.cluster_pois_by_day(
-                geocoded, num_days=days, max_per_day=max_per_day
+                geocoded, num_days=days, max_per_day=max_per_day, coords=coords
             )
         else:
             clustered = self.optimizer.distribute_evenly(included, num_days=days, max_per_day=max_per_day)
@@ -271,12 +390,11 @@ class TravelPlanningOrchestrator:
         session_id    = state["session_id"]
         clustered_days = state["clustered_days"]
 
-        personas = state["personas"]
         user_profile = {
             "destination": state["destination"],
             "start_date":  state["start_date"],
             "end_date":    state["end_date"],
-            "persona":     " & ".join(p.capitalize() for p in personas),
+            "persona":     state["persona_display"],
         }
         itinerary = {
             "session_id": session_id,
@@ -289,12 +407,37 @@ class TravelPlanningOrchestrator:
 
         return {"pdf_path": pdf_path, "map_path": map_path, "status": "completed"}
 
+    @classmethod
+    def _persona_fields(cls, personas: List[str]) -> dict:
+        """Persona-derived state, computed once per run instead of per node."""
+        return {
+            "persona_label":    " & ".join(personas),
+            "persona_display":  " & ".join(p.capitalize() for p in personas),
+            "persona_keywords": [cls.PERSONA_KEYWORDS[p][0] for p in personas if p in cls.PERSONA_KEYWORDS],
+        }
+
     # ── Public entry point ────────────────────────────────────────────────────
 
     def run(self, request: dict) -> dict:
         """
         Execute the full planning pipeline synchronously.
 
+        Thin wrapper around :meth:`arun` for callers without an event loop
+        (scripts, notebooks, tests).
+        """
+        async def _run() -> dict:
+            try:
+                return await self.arun(request)
+            finally:
+                # This loop dies with asyncio.run; release its pooled connections
+                await close_clients()
+
+        return asyncio.run(_run())
+
+    async def arun(self, request: dict) -> dict:
+        """
+        Execute the full planning pipeline on the running event loop.
+
         Args:
             request: dict with keys destination, start_date, end_date,
                      persona, constraints, max_pois_per_day
@@ -302,21 +445,64 @@ class TravelPlanningOrchestrator:
         Returns:
             Final PlanningState dict
         """
+        async for frame in self.run_stream(request):
+            if frame["event"] == "done":
+                return frame["state"]
+
+    async def run_stream(self, request: dict) -> AsyncIterator[dict]:
+        """
+        Execute the pipeline, yielding progress as each node finishes.
+
+        Yields ``{"event": "node", "node": name, "update": dict}`` per
+        completed node – one ``verify_one`` frame per POI during the fan-out –
+        then a final ``{"event": "done", "state": PlanningState}``. Closing
+        the iterator early cancels the remaining work.
+        """
+        initial = self._initial_state(request)
+        state   = initial
+        try:
+            async for mode, chunk in self.graph.astream(
+                initial,
+                config={"max_concurrency": self.VERIFY_CONCURRENCY},
+                stream_mode=["updates", "values"],
+            ):
+                if mode == "values":
+                    state = chunk
+                    continue
+                for node, update in chunk.items():
+                    yield {"event": "node", "node": node, "update": update or {}}
+        except Exception as exc:
+            state = {**initial, "status": "failed", "error": str(exc)}
+
+        yield {"event": "done", "state": state}
+
+    def _initial_state(self, request: dict) -> PlanningState:
         session_id = request.get("session_id") or str(uuid.uuid4())
 
         # Accept either new `personas` list or legacy single `persona`
         raw_personas = request.get("personas") or [request.get("persona", "chilling")]
         personas = [raw_personas] if isinstance(raw_personas, str) else raw_personas
 
-        initial: PlanningState = {
+        try:
+            days_total = (
+                date.fromisoformat(request["end_date"])
+                - date.fromisoformat(request["start_date"])
+            ).days + 1
+        except (TypeError, ValueError):
+            days_total = 3
+
+        return {
             "session_id":      session_id,
             "destination":     request["destination"],
             "start_date":      request["start_date"],
             "end_date":        request["end_date"],
             "personas":        personas,
+            **self._persona_fields(personas),
             "constraints":     request.get("constraints", {}),
             "max_pois_per_day": request.get("max_pois_per_day", 5),
+            "days_total":      days_total,
             "raw_pois":        [],
+            "verification_results": [],
             "verified_pois":   [],
             "rejected_pois":   [],
             "clustered_days":  [],
@@ -327,8 +513,3 @@ class TravelPlanningOrchestrator:
             "error":           None,
             "stats":           {},
         }
-
-        try:
-            return self.graph.invoke(initial)
-        except Exception as exc:
-            return {**initial, "status": "failed", "error": str(exc)}
@@ -1,8 +1,29 @@
-import json
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
 from typing import List, Optional
 
+import orjson
+
+from ..clients import get_anthropic_client
 from ..config import settings
 
+logger = logging.getLogger(__name__)
+
+# ```json … ``` wrapper the model sometimes adds despite instructions;
+# the closing fence is optional so truncated replies still parse.
+_FENCE_RE = re.compile(r"^```(?:json)?\s*(.*?)\s*(?:```)?\s*$", re.DOTALL)
+
+# Process-wide LRU of successful verdicts. Orchestrators (and their agents) are
+# created per planning run, so the cache lives at module level to be shared by
+# retry cycles and by later sessions for the same destination.
+_RESULT_CACHE_SIZE = 1024
+_result_cache: "OrderedDict[str, dict]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
 
 class VerificationAgent:
     """
@@ -15,15 +36,52 @@ class VerificationAgent:
       3. Persona Alignment – does it fit the traveller's style?
     """
 
-    PERSONA_HINTS = {
+    PERSONA_HINTS = MappingProxyType({
         "photography": "scenic views, good lighting, Instagram-worthy spots, unique architecture",
         "chilling":    "relaxed atmosphere, cafes, parks, low-key hangouts, peaceful vibes",
         "foodie":      "authentic cuisine, local specialties, interesting dining experiences",
         "exercise":    "hiking, outdoor activities, sports facilities, wellness centres",
-    }
+    })
+
+    MODEL = "claude-opus-4-6"
+
+    # Static instructions shared by every POI. Sent as a cached system block so
+    # only the short per-POI user message is prefilled after the first call.
+    SYSTEM_PROMPT = """You are a travel verification agent for Click2GO, an intelligent travel planner.
+
+You will receive recent Xiaohongshu social-media posts about one location, together \
+with the traveller's persona and travel dates. Decide whether this location should \
+appear in a personalised travel itinerary.
+
+**Persona hints**
+""" + "\n".join(f"- {name}: {hint}" for name, hint in PERSONA_HINTS.items()) + """
+Combined personas (e.g. "photography & foodie") should weigh every listed style.
+
+**What to check**
+1. Status – Is it currently OPEN? Any closures, renovations, or reported issues?
+2. Seasonality – Given the travel dates, is the current atmosphere/vibe appropriate \
+   (e.g. cherry blossoms in spring, autumn foliage in October)?
+3. Persona match – Does it suit the traveller's persona?
+
+**Reply in strict JSON only (no markdown fences, no extra text):**
+{
+  "is_open": true | false | null,
+  "status_confidence": 0.0–1.0,
+  "seasonal_match": true | false | null,
+  "persona_score": 0.0–10.0,
+  "recommendation": "INCLUDE" | "EXCLUDE",
+  "reasoning": "1–2 sentence explanation",
+  "agent_note": "Practical tip or note for the traveller"
+}"""
+
+    _SYSTEM_BLOCKS = [
+        {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}},
+    ]
 
     def __init__(self):
         self._client = None  # lazy-init so the app starts without a key
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def _get_client(self):
         if self._client is None:
@@ -31,6 +89,10 @@ class VerificationAgent:
             self._client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
         return self._client
 
+    def _get_async_client(self):
+        # Shared per event loop so concurrent verifications reuse one connection pool
+        return get_anthropic_client()
+
     def verify(
         self,
         poi_name: str,
@@ -46,68 +108,163 @@ class VerificationAgent:
           is_open, status_confidence, seasonal_match, persona_score,
           recommendation ("INCLUDE" | "EXCLUDE"), reasoning, agent_note
         """
+        skipped = self._precheck(poi_name, recent_posts)
+        if skipped is not None:
+            return skipped
+
+        cache_key = self._cache_key(poi_name, recent_posts, persona, start_date, end_date)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        user_msg = self._build_user_message(poi_name, recent_posts, persona, start_date, end_date)
+        try:
+            client = self._get_client()
+            with client.messages.stream(**self._request_params(user_msg)) as stream:
+                message = stream.get_final_message()
+            self._log_cache_usage(poi_name, message)
+            result = self._parse_response(message)
+            self._cache_put(cache_key, result)
+            return result
+
+        except orjson.JSONDecodeError:
+            return self._fallback(poi_name, reason="parse_error")
+        except Exception as e:
+            return self._fallback(poi_name, reason=str(e))
+
+    async def verify_async(
+        self,
+        poi_name: str,
+        recent_posts: List[str],
+        persona: str,
+        start_date: str,
+        end_date: str,
+    ) -> dict:
+        """
+        Async variant of :meth:`verify` used by the orchestrator so that
+        every POI of a run can be checked concurrently on one event loop.
+        """
+        skipped = self._precheck(poi_name, recent_posts)
+        if skipped is not None:
+            return skipped
+
+        cache_key = self._cache_key(poi_name, recent_posts, persona, start_date, end_date)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        user_msg = self._build_user_message(poi_name, recent_posts, persona, start_date, end_date)
+        try:
+            client = self._get_async_client()
+            async with client.messages.stream(**self._request_params(user_msg)) as stream:
+                message = await stream.get_final_message()
+            self._log_cache_usage(poi_name, message)
+            result = self._parse_response(message)
+            self._cache_put(cache_key, result)
+            return result
+
+        except orjson.JSONDecodeError:
+            return self._fallback(poi_name, reason="parse_error")
+        except Exception as e:
+            return self._fallback(poi_name, reason=str(e))
+
+    # ── Internal helpers ──────────────────────────────────────────────────────
+
+    def _precheck(self, poi_name: str, recent_posts: List[str]) -> Optional[dict]:
+        """Return a fallback verdict when Claude cannot (or need not) be called."""
         if not recent_posts:
             return self._fallback(poi_name, reason="no_posts")
+        if not self.has_api_key():
+            return self._fallback(poi_name, reason="no_api_key")
+        return None
 
+    @staticmethod
+    def has_api_key() -> bool:
+        """Whether an Anthropic key that looks usable is configured."""
         key = settings.anthropic_api_key
-        if not key or not key.startswith("sk-") or len(key) < 20:
-            return self._fallback(poi_name, reason="no_api_key")
+        return bool(key) and key.startswith("sk-") and len(key) >= 20
+
+    @staticmethod
+    def _cache_key(
+        poi_name: str,
+        recent_posts: List[str],
+        persona: str,
+        start_date: str,
+        end_date: str,
+    ) -> str:
+        posts = "\x1f".join(recent_posts[:5])
+        material = f"{poi_name}|{persona}|{start_date}|{end_date}|{posts}"
+        return hashlib.blake2b(material.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[dict]:
+        with _result_cache_lock:
+            result = _result_cache.get(key)
+            if result is not None:
+                _result_cache.move_to_end(key)
+        if result is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        return dict(result)
 
+    @staticmethod
+    def _cache_put(key: str, result: dict) -> None:
+        with _result_cache_lock:
+            _result_cache[key] = dict(result)
+            _result_cache.move_to_end(key)
+            while len(_result_cache) > _RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+
+    @staticmethod
+    def _build_user_message(
+        poi_name: str,
+        recent_posts: List[str],
+        persona: str,
+        start_date: str,
+        end_date: str,
+    ) -> str:
         posts_text = "\n\n".join(
             f"--- Post {i + 1} ---\n{post}"
             for i, post in enumerate(recent_posts[:5])
         )
-        persona_hint = self.PERSONA_HINTS.get(persona, "general travel experiences")
-
-        prompt = f"""You are a travel verification agent for Click2GO, an intelligent travel planner.
-
-Analyse the recent Xiaohongshu social-media posts below about "{poi_name}" and decide \
-whether this location should appear in a personalised travel itinerary.
-
-**Traveller profile**
-- Persona: {persona} ({persona_hint})
-- Travel dates: {start_date} → {end_date}
-
-**Recent posts**
-{posts_text}
-
-**What to check**
-1. Status – Is it currently OPEN? Any closures, renovations, or reported issues?
-2. Seasonality – Given the travel dates, is the current atmosphere/vibe appropriate \
-   (e.g. cherry blossoms in spring, autumn foliage in October)?
-3. Persona match – Does it suit a "{persona}" traveller?
+        return (
+            f"POI: {poi_name}\n"
+            f"Persona: {persona}\n"
+            f"Dates: {start_date} → {end_date}\n\n"
+            f"Posts:\n{posts_text}"
+        )
 
-**Reply in strict JSON only (no markdown fences, no extra text):**
-{{
-  "is_open": true | false | null,
-  "status_confidence": 0.0–1.0,
-  "seasonal_match": true | false | null,
-  "persona_score": 0.0–10.0,
-  "recommendation": "INCLUDE" | "EXCLUDE",
-  "reasoning": "1–2 sentence explanation",
-  "agent_note": "Practical tip or note for the traveller"
-}}"""
+    def _request_params(self, user_msg: str) -> dict:
+        return {
+            "model":      self.MODEL,
+            "max_tokens": 600,
+            "system":     self._SYSTEM_BLOCKS,
+            "messages":   [{"role": "user", "content": user_msg}],
+        }
 
-        try:
-            client = self._get_client()
-            message = client.messages.create(
-                model="claude-opus-4-6",
-                max_tokens=600,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            raw = message.content[0].text.strip()
+    @staticmethod
+    def _log_cache_usage(poi_name: str, message) -> None:
+        usage = getattr(message, "usage", None)
+        if usage is None:
+            return
+        logger.info(
+            "Verified %s: input=%s cache_read=%s cache_creation=%s",
+            poi_name,
+            getattr(usage, "input_tokens", None),
+            getattr(usage, "cache_read_input_tokens", None),
+            getattr(usage, "cache_creation_input_tokens", None),
+        )
 
-            # Strip markdown fences if the model adds them anyway
-            if raw.startswith("```"):
-                parts = raw.split("```")
-                raw = parts[1].lstrip("json").strip() if len(parts) > 1 else raw
+    @staticmethod
+    def _parse_response(message) -> dict:
+        raw = message.content[0].text.strip()
 
-            return json.loads(raw)
+        # Strip markdown fences if the model adds them anyway
+        m = _FENCE_RE.match(raw)
+        if m:
+            raw = m.group(1)
 
-        except json.JSONDecodeError:
-            return self._fallback(poi_name, reason="parse_error")
-        except Exception as e:
-            return self._fallback(poi_name, reason=str(e))
+        return orjson.loads(raw)
 
     @staticmethod
     def _fallback(poi_name: str, reason: str = "") -> dict:
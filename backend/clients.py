@@ -0,0 +1,78 @@
+"""
+Shared HTTP Clients
+===================
+Pooled ``httpx.AsyncClient`` / ``anthropic.AsyncAnthropic`` instances
+reused by every outbound call (Claude, geocoding, poster downloads), so
+concurrent POIs share keep-alive connections instead of paying a TLS
+handshake each.
+
+httpx connection pools are bound to the event loop that opened them, so
+clients are cached per running loop rather than per process. In the server
+every planning run (``_run_pipeline`` / the SSE stream, gated by
+``_pipeline_slots``) executes on the server loop and shares its one client
+set, which the app lifespan closes on shutdown. Only the synchronous
+``TravelPlanningOrchestrator.run`` wrapper (scripts, tests) starts its own
+loop via ``asyncio.run`` and closes that loop's clients when it returns.
+Lookups never await, so no lock is needed within a loop.
+"""
+import asyncio
+import weakref
+from typing import Optional
+
+import httpx
+
+from .config import settings
+
+try:
+    import h2  # noqa: F401 – enables HTTP/2 multiplexing when installed
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+_LIMITS  = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+_TIMEOUT = 30.0
+
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_anthropic_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled HTTP client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=_LIMITS, http2=_HTTP2, timeout=_TIMEOUT)
+        _http_clients[loop] = client
+    return client
+
+
+def get_anthropic_client():
+    """
+    Return the ``AsyncAnthropic`` client for the running event loop.
+
+    The SDK manages its own connection pool (recent releases reject an
+    injected ``httpx`` client), so it is cached alongside rather than
+    wrapped around the shared HTTP client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _anthropic_clients.get(loop)
+    if client is None:
+        import anthropic
+        client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+        _anthropic_clients[loop] = client
+    return client
+
+
+async def close_clients() -> None:
+    """Close the running loop's clients (app shutdown / end of a synchronous ``run``)."""
+    loop = asyncio.get_running_loop()
+    anthropic_client = _anthropic_clients.pop(loop, None)
+    if anthropic_client is not None:
+        await anthropic_client.close()
+    http_client: Optional[httpx.AsyncClient] = _http_clients.pop(loop, None)
+    if http_client is not None:
+        await http_client.aclose()
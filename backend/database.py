@@ -1,12 +1,41 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from .config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False},  # required for SQLite
-)
+_url       = make_url(settings.database_url)
+_is_sqlite = _url.get_backend_name() == "sqlite"
+
+_engine_kwargs: dict = {"pool_pre_ping": True}
+if _is_sqlite:
+    _engine_kwargs["connect_args"] = {"check_same_thread": False}  # required for SQLite
+
+if _is_sqlite and _url.database in (None, "", ":memory:"):
+    # An in-memory DB only exists per connection: share a single one
+    _engine_kwargs["poolclass"] = StaticPool
+else:
+    # Concurrent pipelines, status polls and SSE streams each check out a
+    # connection; the default 5 + 10 overflow starves under load
+    _engine_kwargs.update(pool_size=20, max_overflow=40, pool_recycle=1800)
+
+engine = create_engine(settings.database_url, **_engine_kwargs)
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _conn_record):
+        """
+        WAL lets the status / result readers proceed while a pipeline is
+        writing POIs. Multi-worker deployments should move to Postgres.
+        """
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-64000")        # 64 MB page cache
+        cursor.execute("PRAGMA mmap_size=268435456")      # 256 MB memory map
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -15,14 +44,16 @@ Base = declarative_base()
 
 def get_db():
     """FastAPI dependency that yields a database session."""
-    db = SessionLocal()
-    try:
+    with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def create_tables():
-    """Create all tables on startup."""
+    """Create all tables on startup, plus any indexes missing from existing ones."""
     from . import models  # noqa: F401 – ensures models are registered before create_all
     Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables wholesale, so indexes added to a model
+    # later (e.g. ix_pois_session_day_stop) would never reach an older database
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -6,8 +6,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
+from .clients import close_clients
 from .database import create_tables
-from .routers import planning, preferences
+from .routers import image, planning, preferences
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers cache outputs (names are per session)."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
 
 
 @asynccontextmanager
@@ -16,7 +26,8 @@ async def lifespan(app: FastAPI):
     create_tables()
     os.makedirs("outputs", exist_ok=True)
     yield
-    # ── Shutdown (nothing to clean up for now) ────────────────
+    # ── Shutdown ─────────────────────────────────────────────
+    await close_clients()
 
 
 app = FastAPI(
@@ -40,13 +51,14 @@ app.add_middleware(
 
 # Serve generated PDFs and maps as static files
 if os.path.isdir("outputs"):
-    app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
+    app.mount("/outputs", CachedStaticFiles(directory="outputs"), name="outputs")
 
 # Serve the frontend HTML
 FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "..", "frontend")
 
 app.include_router(planning.router, prefix="/api/v1", tags=["Planning"])
 app.include_router(preferences.router, prefix="/api/v1", tags=["Preferences"])
+app.include_router(image.router, prefix="/api/v1", tags=["Image"])
 
 
 @app.get("/", tags=["Root"], include_in_schema=False)
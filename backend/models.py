@@ -2,7 +2,7 @@ import enum
 
 from sqlalchemy import (
     Boolean, Column, DateTime, Float, ForeignKey,
-    Integer, JSON, String, Text,
+    Index, Integer, JSON, String, Text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -89,6 +89,11 @@ class POI(Base):
 
     session = relationship("PlanningSession", back_populates="pois")
 
+    # Itinerary reads filter by session and order by (day, stop): serve both from one index
+    __table_args__ = (
+        Index("ix_pois_session_day_stop", "session_id", "day_number", "stop_order"),
+    )
+
 
 class ItineraryDay(Base):
     __tablename__ = "itinerary_days"
@@ -4,27 +4,123 @@ Image Router
 POST /api/v1/plan/{session_id}/generate-image
     Body: { "language": "en" | "zh" }
     Returns: { "image_url": str | null, "prompt_used": str, "error": str | null }
+
+The first call returns the Pollinations URL straight away and caches the
+poster under /outputs/ in the background; later calls for the same session,
+language and prompt return the cached copy. A sidecar ``.json`` keeps the
+source URL and ETag / Last-Modified, so a stale copy is revalidated with a
+conditional GET instead of downloaded again.
 """
+import json
+import logging
 import os
+import tempfile
+import time
 from typing import Dict, List, Literal, Optional
 
-import requests as _requests
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+import aiofiles
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from ..clients import get_http_client
 from ..database import get_db
 from ..models import POI, PlanningSession, SessionStatus, UserProfile
 from ..tools.image_generator import generate_travel_poster
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+_POLLINATIONS_TIMEOUT = 60        # seconds; a render can take 10–30 s
+_DOWNLOAD_CHUNK       = 64 * 1024
+_POSTER_MAX_AGE       = 86400     # revalidate cached posters older than this
+
+
+async def _download_to(url: str, save_path: str, headers: Optional[dict] = None):
+    """
+    Stream ``url`` to ``save_path`` without blocking the event loop.
+
+    Returns the response headers, or ``None`` when the server answered
+    304 Not Modified to a conditional request (the file is left as is).
+    """
+    save_dir = os.path.dirname(save_path)
+    os.makedirs(save_dir, exist_ok=True)
+    async with get_http_client().stream(
+        "GET", url, headers=headers, timeout=_POLLINATIONS_TIMEOUT
+    ) as resp:
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+        # Unique temp name so concurrent downloads of one poster don't share
+        # it; removed again if the download fails or is cancelled
+        fd, tmp_path = tempfile.mkstemp(
+            dir=save_dir, prefix=os.path.basename(save_path) + ".", suffix=".part",
+        )
+        os.close(fd)
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in resp.aiter_bytes(_DOWNLOAD_CHUNK):
+                    await f.write(chunk)
+            os.replace(tmp_path, save_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    return resp.headers
+
+
+def _read_meta(save_path: str) -> dict:
+    try:
+        with open(f"{save_path}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(save_path: str, meta: dict) -> None:
+    with open(f"{save_path}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+async def _cache_poster(url: str, save_path: str) -> None:
+    """Background task: keep a local copy of the poster for repeat requests."""
+    meta = _read_meta(save_path)
+    headers = {}
+    if meta.get("url") == url and os.path.exists(save_path):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        resp_headers = await _download_to(url, save_path, headers)
+    except Exception as exc:
+        logger.warning("Could not cache poster %s: %s", save_path, exc)
+        return
+
+    if resp_headers is not None:
+        meta = {
+            "url":           url,
+            "etag":          resp_headers.get("etag"),
+            "last_modified": resp_headers.get("last-modified"),
+        }
+    meta["fetched_at"] = time.time()
+    _write_meta(save_path, meta)
+
 
 class ImageRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     language: Literal["en", "zh"] = "en"
 
 
 class ImageResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     session_id: str
     language: str
     image_url: Optional[str] = None
@@ -37,39 +133,42 @@ class ImageResponse(BaseModel):
 async def generate_image(
     session_id: str,
     body: ImageRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     """
     Generate a cartoon travel poster for a completed planning session.
-    Fetches the image from Pollinations AI and serves it from /outputs/
-    so the browser loads it from localhost (no external URL issues).
+    Returns the Pollinations AI URL for the browser to load directly while
+    a local copy is saved to /outputs/; once saved, that copy is returned.
     """
-    # ── Validate session ──────────────────────────────────────────────────────
-    session = db.query(PlanningSession).filter(PlanningSession.id == session_id).first()
-    if not session:
+    # ── Validate session & fetch profile (one round-trip) ────────────────────
+    row = db.execute(
+        select(PlanningSession.status, UserProfile.destination, UserProfile.persona)
+        .outerjoin(UserProfile, UserProfile.id == PlanningSession.user_profile_id)
+        .where(PlanningSession.id == session_id)
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Planning session not found")
-    if session.status != SessionStatus.COMPLETED:
+    status, destination, persona = row
+    if status != SessionStatus.COMPLETED:
         raise HTTPException(
             status_code=400,
-            detail=f"Session is not completed yet (status: {session.status})",
+            detail=f"Session is not completed yet (status: {status})",
         )
 
-    # ── Fetch profile & itinerary ─────────────────────────────────────────────
-    profile = db.query(UserProfile).filter(UserProfile.id == session.user_profile_id).first()
-    destination = profile.destination if profile else "Unknown Destination"
-    personas    = [p.strip() for p in (profile.persona or "travel").split(",")]
+    destination = destination or "Unknown Destination"
+    personas    = [p.strip() for p in (persona or "travel").split(",")]
 
-    pois = (
-        db.query(POI)
-        .filter(POI.session_id == session_id, POI.day_number.isnot(None))
+    # ── Fetch itinerary: only the columns the prompt needs ────────────────────
+    rows = db.execute(
+        select(POI.name, POI.day_number)
+        .where(POI.session_id == session_id, POI.day_number.isnot(None))
         .order_by(POI.day_number, POI.stop_order)
-        .all()
-    )
+    ).all()
 
     days_map: Dict[int, List[str]] = {}
-    for poi in pois:
-        dn = poi.day_number or 1
-        days_map.setdefault(dn, []).append(poi.name)
+    for name, day_number in rows:
+        days_map.setdefault(day_number or 1, []).append(name)
 
     itinerary_data = {
         "destination": destination,
@@ -80,6 +179,10 @@ async def generate_image(
         ],
     }
 
+    short_id  = session_id[:8]
+    filename  = f"poster_{short_id}_{body.language}.jpg"
+    save_path = os.path.join("outputs", filename)
+
     # ── Build Pollinations URL ────────────────────────────────────────────────
     result = generate_travel_poster(
         language       = body.language,
@@ -96,29 +199,21 @@ async def generate_image(
         )
 
     pollinations_url = result["image_url"]
-
-    # ── Fetch image from Pollinations and save locally ────────────────────────
-    short_id  = session_id[:8]
-    lang_tag  = body.language
-    filename  = f"poster_{short_id}_{lang_tag}.jpg"
-    save_path = os.path.join("outputs", filename)
-
-    try:
-        resp = _requests.get(pollinations_url, timeout=60)
-        resp.raise_for_status()
-        os.makedirs("outputs", exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(resp.content)
-        local_url = f"/outputs/{filename}"
-    except Exception as exc:
-        # Fall back to returning the direct Pollinations URL
-        local_url = pollinations_url
-        result["error"] = f"Could not cache image locally ({exc}); using direct URL."
+    meta = _read_meta(save_path)
+    if meta.get("url") == pollinations_url and os.path.exists(save_path):
+        image_url = f"/outputs/{filename}"
+        if time.time() - meta.get("fetched_at", 0) > _POSTER_MAX_AGE:
+            background_tasks.add_task(_cache_poster, pollinations_url, save_path)
+    else:
+        # Don't make the user wait on a 10–30 s render + download: the
+        # browser can load the Pollinations URL itself
+        image_url = pollinations_url
+        background_tasks.add_task(_cache_poster, pollinations_url, save_path)
 
     return ImageResponse(
         session_id  = session_id,
         language    = body.language,
-        image_url   = local_url,
+        image_url   = image_url,
         prompt_used = result.get("prompt_used", ""),
         error       = result.get("error"),
         success     = True,
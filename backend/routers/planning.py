@@ -2,14 +2,24 @@
 Planning Router
 ===============
 POST /api/v1/plan                    – start a new planning session (async)
+POST /api/v1/plan/stream             – start a session and stream progress (SSE)
 GET  /api/v1/plan/{id}/status        – poll pipeline progress
 GET  /api/v1/plan/{id}/result        – retrieve the completed itinerary
 """
+import asyncio
 import os
 import uuid
 from datetime import datetime
-
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
+from typing import AsyncIterator, List, Optional, Tuple
+
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from ..database import SessionLocal, get_db
@@ -24,100 +34,200 @@ from ..schemas import (
 
 router = APIRouter()
 
+# Validates a day's POI rows in one call instead of one model_validate each
+_POI_LIST = TypeAdapter(List[POISchema])
 
 # ── Background task ───────────────────────────────────────────────────────────
 
-def _run_pipeline(session_id: str, request_data: dict) -> None:
+# Pipelines run as coroutines on the server loop instead of each holding a
+# threadpool thread for minutes. At most this many run at once (polled and
+# streamed alike); the rest wait for a slot.
+MAX_CONCURRENT_PIPELINES = 4
+_pipeline_slots = asyncio.Semaphore(MAX_CONCURRENT_PIPELINES)
+
+
+async def _run_pipeline(session_id: str, request_data: dict) -> None:
     """
-    Runs the full Click2GO planning pipeline in a background thread.
-    Opens its own DB session so FastAPI's request session isn't shared.
+    Runs the full Click2GO planning pipeline as a background task.
+    Database work goes to worker threads, each with its own DB session,
+    so neither the event loop nor FastAPI's request session is shared.
     """
     from ..agents.orchestrator import TravelPlanningOrchestrator
 
-    db = SessionLocal()
-    try:
+    async with _pipeline_slots:
+        try:
+            if not await asyncio.to_thread(_set_status, session_id, SessionStatus.SCRAPING):
+                return
+
+            orchestrator = TravelPlanningOrchestrator()
+            result       = await orchestrator.arun({**request_data, "session_id": session_id})
+
+            await asyncio.to_thread(_save_result, session_id, result)
+
+        except Exception as exc:
+            await asyncio.to_thread(_mark_failed, session_id, str(exc))
+
+
+def _persist_result(db: Session, session: PlanningSession, result: dict) -> None:
+    """Store the routed POIs, day sequences and final stats of a pipeline run."""
+    # POI rows, day rows and each day's name sequence in a single walk over
+    # the itinerary, then one executemany per table instead of a
+    # unit-of-work flush per ORM object
+    poi_rows: List[dict] = []
+    day_rows: List[dict] = []
+    for day_idx, day_pois in enumerate(result.get("clustered_days", [])):
+        names: List[str] = []
+        for stop_idx, p in enumerate(day_pois):
+            names.append(p.get("name"))
+            poi_rows.append({
+                "session_id":   session.id,
+                "name":         p.get("name", ""),
+                "address":      p.get("address"),
+                "lat":          p.get("lat"),
+                "lng":          p.get("lng"),
+                "category":     p.get("category"),
+                "likes":        p.get("likes", 0),
+                "source_url":   p.get("source_url", ""),
+                "raw_content":  (p.get("raw_content") or "")[:2000],
+                "is_verified":  True,
+                "is_open":      p.get("is_open"),
+                "seasonal_match": p.get("seasonal_match"),
+                "persona_score":  p.get("persona_score"),
+                "verification_recommendation": p.get("recommendation"),
+                "agent_note":   p.get("agent_note", ""),
+                "day_number":   day_idx + 1,
+                "stop_order":   stop_idx + 1,
+            })
+        day_rows.append({
+            "session_id":   session.id,
+            "day_number":   day_idx + 1,
+            "poi_sequence": names,
+        })
+
+    if poi_rows:
+        db.execute(insert(POI), poi_rows)
+    if day_rows:
+        db.execute(insert(ItineraryDay), day_rows)
+
+    # ── Update session stats ──────────────────────────────────────────────
+    stats = result.get("stats", {})
+    session.status              = (
+        SessionStatus.COMPLETED if result.get("status") == "completed"
+        else SessionStatus.FAILED
+    )
+    session.total_pois_scraped  = stats.get("total_scraped", 0)
+    session.total_pois_verified = stats.get("total_verified", 0)
+    session.total_pois_included = stats.get("total_included", 0)
+    session.completed_at        = datetime.utcnow()
+    session.error_message       = result.get("error")
+    db.commit()
+
+
+def _set_status(session_id: str, status: SessionStatus) -> bool:
+    """Update a session's status; False if the session no longer exists."""
+    with SessionLocal() as db:
         session = db.query(PlanningSession).filter(PlanningSession.id == session_id).first()
         if not session:
-            return
-
-        session.status = SessionStatus.SCRAPING
+            return False
+        session.status = status
+        db.commit()
+    return True
+
+
+def _mark_failed(session_id: str, message: str) -> None:
+    # Always a fresh session: the one that hit the error may be unusable.
+    # A single guarded UPDATE, so a run whose result was already saved (e.g.
+    # a stream that disconnected during the final save) keeps its outcome.
+    with SessionLocal() as db:
+        db.query(PlanningSession).filter(
+            PlanningSession.id == session_id,
+            PlanningSession.status.notin_((SessionStatus.COMPLETED, SessionStatus.FAILED)),
+        ).update(
+            {"status": SessionStatus.FAILED, "error_message": message},
+            synchronize_session=False,
+        )
         db.commit()
 
-        orchestrator = TravelPlanningOrchestrator()
-        result       = orchestrator.run({**request_data, "session_id": session_id})
 
-        # ── Persist POIs ──────────────────────────────────────────────────────
-        session.status = SessionStatus.ROUTING
-        db.commit()
+def _save_result(session_id: str, result: dict) -> None:
+    with SessionLocal() as db:
+        session = db.query(PlanningSession).filter(PlanningSession.id == session_id).first()
+        if session:
+            _persist_result(db, session, result)
 
-        for day_idx, day_pois in enumerate(result.get("clustered_days", [])):
-            for stop_idx, p in enumerate(day_pois):
-                db.add(POI(
-                    session_id   = session_id,
-                    name         = p.get("name", ""),
-                    address      = p.get("address"),
-                    lat          = p.get("lat"),
-                    lng          = p.get("lng"),
-                    category     = p.get("category"),
-                    likes        = p.get("likes", 0),
-                    source_url   = p.get("source_url", ""),
-                    raw_content  = (p.get("raw_content") or "")[:2000],
-                    is_verified  = True,
-                    is_open      = p.get("is_open"),
-                    seasonal_match = p.get("seasonal_match"),
-                    persona_score  = p.get("persona_score"),
-                    verification_recommendation = p.get("recommendation"),
-                    agent_note   = p.get("agent_note", ""),
-                    day_number   = day_idx + 1,
-                    stop_order   = stop_idx + 1,
-                ))
-
-        for day_idx, day_pois in enumerate(result.get("clustered_days", [])):
-            db.add(ItineraryDay(
-                session_id   = session_id,
-                day_number   = day_idx + 1,
-                poi_sequence = [p.get("name") for p in day_pois],
-            ))
-
-        # ── Update session stats ──────────────────────────────────────────────
-        stats = result.get("stats", {})
-        session.status              = (
-            SessionStatus.COMPLETED if result.get("status") == "completed"
-            else SessionStatus.FAILED
-        )
-        session.total_pois_scraped  = stats.get("total_scraped", 0)
-        session.total_pois_verified = stats.get("total_verified", 0)
-        session.total_pois_included = stats.get("total_included", 0)
-        session.completed_at        = datetime.utcnow()
-        session.error_message       = result.get("error")
-        db.commit()
 
-    except Exception as exc:
-        db.rollback()
-        sess = db.query(PlanningSession).filter(PlanningSession.id == session_id).first()
-        if sess:
-            sess.status        = SessionStatus.FAILED
-            sess.error_message = str(exc)
-            db.commit()
-    finally:
-        db.close()
+# ── Streaming (SSE) ───────────────────────────────────────────────────────────
 
+# Pipeline node → session status reached once that node has finished
+_NODE_STATUS = {
+    "scrape_pois":     SessionStatus.VERIFYING,
+    "verify_one":      SessionStatus.VERIFYING,
+    "verify_pois":     SessionStatus.VERIFYING,
+    "filter_pois":     SessionStatus.ROUTING,
+    "optimize_route":  SessionStatus.EXPORTING,
+    "generate_output": SessionStatus.EXPORTING,
+}
 
-# ── Endpoints ─────────────────────────────────────────────────────────────────
 
-@router.post("/plan", response_model=PlanningSessionResponse, status_code=202)
-async def create_plan(
-    request: PlanningRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-):
-    """
-    Start a new agentic travel planning session.
+def _sse(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
 
-    The pipeline runs asynchronously.
-    Poll **GET /api/v1/plan/{session_id}/status** to track progress,
-    then **GET /api/v1/plan/{session_id}/result** for the final itinerary.
+
+async def _event_stream(session_id: str, request_data: dict) -> AsyncIterator[bytes]:
+    """
+    Run the pipeline on the server loop and emit Server-Sent Events:
+    ``progress`` per finished node (with each POI as its verification
+    completes), then ``done``. If the client disconnects, the run is
+    cancelled and the session marked failed unless its result was saved.
     """
+    from ..agents.orchestrator import TravelPlanningOrchestrator
+
+    verified = 0
+    try:
+        yield _sse("session", {"session_id": session_id})
+        async with _pipeline_slots:
+            orchestrator = TravelPlanningOrchestrator()
+            async for frame in orchestrator.run_stream({**request_data, "session_id": session_id}):
+                if frame["event"] == "done":
+                    result = frame["state"]
+                    await asyncio.to_thread(_save_result, session_id, result)
+                    yield _sse("done", {
+                        "session_id": session_id,
+                        "status":     result.get("status"),
+                        "error":      result.get("error"),
+                    })
+                    return
+
+                node, update = frame["node"], frame["update"]
+                data = {"node": node, "status": _NODE_STATUS.get(node, SessionStatus.SCRAPING).value}
+                if node == "verify_one":
+                    for r in update.get("verification_results", []):
+                        verified += 1
+                        p = r["poi"]
+                        data["poi"] = {
+                            "name":           p.get("name"),
+                            "recommendation": p.get("recommendation"),
+                            "persona_score":  p.get("persona_score"),
+                        }
+                    data["verified"] = verified
+                elif "stats" in update:
+                    data["stats"] = update["stats"]
+                yield _sse("progress", data)
+    except (asyncio.CancelledError, GeneratorExit):
+        # Hand the DB write to the default executor without awaiting it: the
+        # stream is being torn down, and the loop must not block on SQLite
+        asyncio.get_running_loop().run_in_executor(
+            None, _mark_failed, session_id, "Client disconnected before planning finished",
+        )
+        raise
+    except Exception as exc:
+        await asyncio.to_thread(_mark_failed, session_id, str(exc))
+        yield _sse("done", {"session_id": session_id, "status": "failed", "error": str(exc)})
+
+
+# ── Request helpers ───────────────────────────────────────────────────────────
+
+def _create_session(request: PlanningRequest, db: Session, status: SessionStatus) -> str:
     personas_str = ",".join(p.value for p in request.personas)
     profile = UserProfile(
         destination = request.destination,
@@ -132,27 +242,59 @@ async def create_plan(
     db.flush()
 
     session_id = str(uuid.uuid4())
-    session    = PlanningSession(
+    db.add(PlanningSession(
         id              = session_id,
         user_profile_id = profile.id,
-        status          = SessionStatus.PENDING,
-    )
-    db.add(session)
+        status          = status,
+    ))
     db.commit()
+    return session_id
 
-    background_tasks.add_task(
-        _run_pipeline,
-        session_id,
-        {
-            "destination":      request.destination,
-            "start_date":       request.start_date,
-            "end_date":         request.end_date,
-            "personas":         [p.value for p in request.personas],
-            "constraints":      request.constraints.model_dump(),
-            "max_pois_per_day": request.max_pois_per_day,
-        },
+
+@lru_cache(maxsize=1024)
+def _output_urls(short_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    ``/outputs`` URLs of a session's PDF and map, or None where missing.
+    Cached for completed sessions: exports are written before the session
+    is marked completed and never change afterwards.
+    """
+    pdf_name = f"itinerary_{short_id}.pdf"
+    map_name = f"map_{short_id}.html"
+    return (
+        f"/outputs/{pdf_name}" if os.path.isfile(os.path.join("outputs", pdf_name)) else None,
+        f"/outputs/{map_name}" if os.path.isfile(os.path.join("outputs", map_name)) else None,
     )
 
+
+def _pipeline_input(request: PlanningRequest) -> dict:
+    return {
+        "destination":      request.destination,
+        "start_date":       request.start_date,
+        "end_date":         request.end_date,
+        "personas":         [p.value for p in request.personas],
+        "constraints":      request.constraints.model_dump(),
+        "max_pois_per_day": request.max_pois_per_day,
+    }
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────────
+
+@router.post("/plan", response_model=PlanningSessionResponse, status_code=202)
+async def create_plan(
+    request: PlanningRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """
+    Start a new agentic travel planning session.
+
+    The pipeline runs asynchronously.
+    Poll **GET /api/v1/plan/{session_id}/status** to track progress,
+    then **GET /api/v1/plan/{session_id}/result** for the final itinerary.
+    """
+    session_id = _create_session(request, db, SessionStatus.PENDING)
+    background_tasks.add_task(_run_pipeline, session_id, _pipeline_input(request))
+
     return PlanningSessionResponse(
         session_id = session_id,
         status     = SessionStatus.PENDING,
@@ -163,6 +305,24 @@ async def create_plan(
     )
 
 
+@router.post("/plan/stream")
+async def stream_plan(request: PlanningRequest, db: Session = Depends(get_db)):
+    """
+    Start a planning session and stream its progress as Server-Sent Events.
+
+    Emits ``session`` (the new id), ``progress`` after each pipeline step –
+    including one frame per POI as its verification completes – and finally
+    ``done``. The itinerary is then available from
+    **GET /api/v1/plan/{session_id}/result**.
+    """
+    session_id = _create_session(request, db, SessionStatus.SCRAPING)
+    return StreamingResponse(
+        _event_stream(session_id, _pipeline_input(request)),
+        media_type = "text/event-stream",
+        headers    = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/plan/{session_id}/status", response_model=PlanningStatusResponse)
 async def get_plan_status(session_id: str, db: Session = Depends(get_db)):
     """Poll the progress of a planning session."""
@@ -192,7 +352,12 @@ async def get_plan_status(session_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/plan/{session_id}/result", response_model=PlanningSessionResponse)
-async def get_plan_result(session_id: str, db: Session = Depends(get_db)):
+async def get_plan_result(
+    session_id: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+):
     """Retrieve the completed itinerary for a session."""
     session = db.query(PlanningSession).filter(PlanningSession.id == session_id).first()
     if not session:
@@ -204,28 +369,32 @@ async def get_plan_result(session_id: str, db: Session = Depends(get_db)):
             detail=f"Session still in progress: {session.status}",
         )
 
+    # A completed itinerary never changes: let clients revalidate for free
+    if session.status == SessionStatus.COMPLETED and session.completed_at:
+        etag = f'W/"{session_id}:{int(session.completed_at.timestamp())}"'
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, max-age=3600, immutable"
+
     pois = (
         db.query(POI)
         .filter(POI.session_id == session_id, POI.day_number.isnot(None))
         .order_by(POI.day_number, POI.stop_order)
-        .all()
+        .yield_per(100)          # stream in windows; groupby consumes lazily
     )
 
-    days_map: dict = {}
-    for poi in pois:
-        dn = poi.day_number or 1
-        days_map.setdefault(dn, []).append(POISchema.model_validate(poi))
-
+    # Rows arrive ordered by (day_number, stop_order): group them in one pass
     itinerary_days = [
-        ItineraryDaySchema(day_number=dn, pois=ps)
-        for dn, ps in sorted(days_map.items())
+        ItineraryDaySchema(day_number=dn, pois=_POI_LIST.validate_python(list(group), from_attributes=True))
+        for dn, group in groupby(pois, key=attrgetter("day_number"))
     ]
 
-    pdf_url = map_url = None
-    if os.path.exists(f"outputs/itinerary_{session_id[:8]}.pdf"):
-        pdf_url = f"/outputs/itinerary_{session_id[:8]}.pdf"
-    if os.path.exists(f"outputs/map_{session_id[:8]}.html"):
-        map_url = f"/outputs/map_{session_id[:8]}.html"
+    if session.status == SessionStatus.COMPLETED:
+        pdf_url, map_url = _output_urls(session_id[:8])
+    else:
+        pdf_url, map_url = _output_urls.__wrapped__(session_id[:8])
 
     return PlanningSessionResponse(
         session_id = session_id,
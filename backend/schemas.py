@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
@@ -81,3 +82,25 @@ class PlanningStatusResponse(BaseModel):
     total_pois_included: int = 0
     error_message: Optional[str] = None
     result: Optional[PlanningSessionResponse] = None
+
+
+class PreferencesSavedResponse(BaseModel):
+    id: int
+    destination: str
+    persona: str
+    message: str = "Preferences saved successfully"
+
+
+class PreferencesResponse(BaseModel):
+    id: int
+    destination: str
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    persona: str
+    allergies: List[str] = []
+    budget: Optional[str] = None
+    language: str = "en"
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -8,6 +8,79 @@ backtracking during the day.
 import math
 from typing import Dict, List
 
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _haversine_key(dlat, dlng, cos_lat1, cos_lat2):
+    """
+    Haversine term ``a`` for radian deltas (scalars or NumPy arrays).
+
+    Distance is ``2R·asin(√a)``, which is monotonic in ``a``, so nearest-point
+    comparisons can rank on ``a`` and skip the ``asin``/``sqrt``/``R``. The
+    caller passes the cosines so they are computed once, not per comparison.
+    """
+    return np.sin(dlat / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin(dlng / 2) ** 2
+
+
+def pairwise_haversine_km(lats, lngs) -> np.ndarray:
+    """
+    Full ``(N, N)`` great-circle distance matrix in km for points given as
+    degree arrays, in one vectorised pass (batch counterpart of
+    ``RouteOptimizer._haversine``).
+    """
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lng = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    a = _haversine_key(
+        lat[:, None] - lat[None, :],
+        lng[:, None] - lng[None, :],
+        cos_lat[:, None],
+        cos_lat[None, :],
+    )
+    return 6371.0 * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _haversine_assign_np(coords, centers):
+    """
+    Index of the nearest centre (great-circle) for each point.
+
+    Both arrays are ``[lat, lng]`` rows in radians.
+    """
+    a = _haversine_key(
+        centers[None, :, 0] - coords[:, None, 0],
+        centers[None, :, 1] - coords[:, None, 1],
+        np.cos(coords[:, None, 0]),
+        np.cos(centers[None, :, 0]),
+    )
+    return np.argmin(a, axis=1)
+
+
+if numba is not None:
+    @numba.njit(cache=True, parallel=True, fastmath=True)
+    def _haversine_assign(coords, centers):
+        n, k = coords.shape[0], centers.shape[0]
+        labels  = np.empty(n, dtype=np.int64)
+        cos_ctr = np.cos(centers[:, 0])
+        for i in numba.prange(n):
+            cos_lat = math.cos(coords[i, 0])
+            best, best_j = np.inf, 0
+            for j in range(k):
+                s_lat = math.sin((centers[j, 0] - coords[i, 0]) * 0.5)
+                s_lng = math.sin((centers[j, 1] - coords[i, 1]) * 0.5)
+                a = s_lat * s_lat + cos_lat * cos_ctr[j] * s_lng * s_lng
+                if a < best:
+                    best, best_j = a, j
+            labels[i] = best_j
+        return labels
+else:
+    _haversine_assign = _haversine_assign_np
+
 
 class RouteOptimizer:
     """
@@ -17,11 +90,21 @@ class RouteOptimizer:
     distribute_evenly()    – fallback when no coordinates are available
     """
 
+    # Below this many POIs (when they all fit in the trip), a 1-D sweep
+    # partition replaces K-Means; above MINIBATCH_THRESHOLD, mini-batch is used
+    SWEEP_MAX_POIS      = 20
+    MINIBATCH_THRESHOLD = 200
+    # From this many POIs the Numba haversine kernel (when installed) replaces
+    # the NumPy one; below it dispatch/compile cost outweighs the loop. The
+    # pipeline caps candidates at 20, so in the app the NumPy version runs.
+    NUMBA_MIN_POIS = 32
+
     def cluster_pois_by_day(
         self,
         pois: List[Dict],
         num_days: int,
         max_per_day: int = 5,
+        coords=None,
     ) -> List[List[Dict]]:
         """
         Cluster geocoded POIs into ``num_days`` daily zones.
@@ -30,33 +113,57 @@ class RouteOptimizer:
             pois:        POI dicts that each have ``lat`` and ``lng``.
             num_days:    Number of travel days.
             max_per_day: Hard cap on stops per day.
+            coords:      Optional ``(N, 2)`` float64 array of ``[lat, lng]``
+                         rows aligned with ``pois``. When given, the POIs are
+                         assumed to be geocoded already and the array is fed
+                         to K-Means as-is.
 
         Returns:
             List[List[POI]] – one inner list per day, each sorted
             by nearest-neighbour visiting order.
         """
-        import numpy as np
-        from sklearn.cluster import KMeans
-
-        # Safety: only cluster what has coordinates
-        geo = [p for p in pois if p.get("lat") and p.get("lng")]
-        if not geo:
-            return self.distribute_evenly(pois, num_days, max_per_day)
+        if coords is None:
+            # Safety: only cluster what has coordinates
+            geo = [p for p in pois if p.get("lat") is not None and p.get("lng") is not None]
+            if not geo:
+                return self.distribute_evenly(pois, num_days, max_per_day)
+            coords = np.array([[p["lat"], p["lng"]] for p in geo], dtype=np.float64)
+        else:
+            geo = pois
 
         k = min(num_days, len(geo))
-        coords = np.array([[p["lat"], p["lng"]] for p in geo])
 
-        km = KMeans(n_clusters=k, random_state=42, n_init=10, max_iter=300)
-        labels = km.fit_predict(coords)
+        # Trivial shapes: nothing to cluster
+        if k <= 1:
+            return [self._nearest_neighbour(geo, np.radians(coords))[:max_per_day]]
+        if len(geo) <= num_days:
+            return [[p] for p in geo]
 
-        clusters: List[List[Dict]] = [[] for _ in range(k)]
-        for poi, label in zip(geo, labels):
-            clusters[label].append(poi)
+        if len(geo) < self.SWEEP_MAX_POIS and len(geo) <= num_days * max_per_day:
+            labels = self._sweep_partition(coords, k)
+        else:
+            if len(geo) > self.MINIBATCH_THRESHOLD:
+                km = MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3)
+            else:
+                # k-means++ seeding makes extra restarts pointless on a few
+                # hundred 2-D points
+                km = KMeans(n_clusters=k, random_state=42, n_init=1, init="k-means++",
+                            algorithm="lloyd", max_iter=50)
+            km.fit(coords)
+            # K-Means fits on planar lat/lng; assign each POI to its nearest
+            # centre by haversine distance instead
+            assign = (
+                _haversine_assign if len(geo) >= self.NUMBA_MIN_POIS
+                else _haversine_assign_np
+            )
+            labels = assign(np.radians(coords), np.radians(km.cluster_centers_))
 
+        coords_rad = np.radians(coords)
         result = []
-        for cluster in clusters:
-            if cluster:
-                sorted_c = self._nearest_neighbour(cluster)
+        for c in range(k):
+            idx = np.flatnonzero(labels == c)
+            if idx.size:
+                sorted_c = self._nearest_neighbour([geo[i] for i in idx], coords_rad[idx])
                 result.append(sorted_c[:max_per_day])
 
         return [d for d in result if d]
@@ -71,7 +178,11 @@ class RouteOptimizer:
         Fallback distribution: sort by persona_score and spread evenly
         across days without clustering.
         """
-        sorted_pois = sorted(pois, key=lambda p: p.get("persona_score", 0), reverse=True)
+        # Keys read once per POI rather than once per comparison; `or 0`
+        # also ranks POIs whose score is None last instead of failing
+        scores = [p.get("persona_score") or 0 for p in pois]
+        order  = sorted(range(len(pois)), key=scores.__getitem__, reverse=True)
+        sorted_pois = [pois[i] for i in order]
         pois_per_day = max(1, min(max_per_day, max(1, len(sorted_pois) // max(num_days, 1))))
 
         days: List[List[Dict]] = []
@@ -90,33 +201,59 @@ class RouteOptimizer:
 
     # ── Internal helpers ──────────────────────────────────────────────────────
 
-    def _nearest_neighbour(self, pois: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def _sweep_partition(coords, k: int):
+        """
+        Split points into ``k`` contiguous, equal-sized bands along the axis
+        with the widest ground spread (lng scaled by cos(lat)). Every band
+        holds at most ⌈N/k⌉ points, so nothing is dropped by the day cap.
+        """
+        lat, lng = coords[:, 0], coords[:, 1]
+        lng_span = np.ptp(lng) * math.cos(math.radians(float(lat.mean())))
+        axis  = lat if np.ptp(lat) >= lng_span else lng
+        order = np.argsort(axis, kind="stable")
+
+        labels = np.empty(len(coords), dtype=np.intp)
+        for band, idx in enumerate(np.array_split(order, k)):
+            labels[idx] = band
+        return labels
+
+    def _nearest_neighbour(self, pois: List[Dict], coords_rad=None) -> List[Dict]:
         """
         Sort POIs with a greedy nearest-neighbour heuristic.
         Starts from the northernmost POI (natural 'morning start').
+
+        ``coords_rad`` is an optional ``(N, 2)`` array of ``[lat, lng]`` in
+        radians aligned with ``pois``; each step scores every unvisited POI
+        in one vectorised haversine pass.
         """
-        if len(pois) <= 1:
+        n = len(pois)
+        if n <= 1:
             return pois
+        if coords_rad is None:
+            coords_rad = np.radians(np.array(
+                [[p.get("lat", 0), p.get("lng", 0)] for p in pois], dtype=np.float64
+            ))
 
-        remaining = sorted(pois, key=lambda p: -p.get("lat", 0))
-        ordered   = [remaining.pop(0)]
-
-        while remaining:
-            cur     = ordered[-1]
-            nearest = min(
-                remaining,
-                key=lambda p: self._haversine(
-                    cur.get("lat", 0), cur.get("lng", 0),
-                    p.get("lat", 0),   p.get("lng", 0),
-                ),
-            )
-            ordered.append(nearest)
-            remaining.remove(nearest)
+        lat, lng = coords_rad[:, 0], coords_rad[:, 1]
+        cos_lat  = np.cos(lat)
+        visited  = np.zeros(n, dtype=bool)
+
+        cur = int(np.argmax(lat))
+        visited[cur] = True
+        order = [cur]
+        for _ in range(n - 1):
+            a = _haversine_key(lat - lat[cur], lng - lng[cur], cos_lat[cur], cos_lat)
+            a[visited] = np.inf
+            cur = int(np.argmin(a))
+            visited[cur] = True
+            order.append(cur)
 
-        return ordered
+        return [pois[i] for i in order]
 
     @staticmethod
     def _haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        """Great-circle distance in km (use ``_haversine_key`` to only compare)."""
         R  = 6371.0
         φ1, φ2 = math.radians(lat1), math.radians(lat2)
         dφ, dλ = math.radians(lat2 - lat1), math.radians(lng2 - lng1)
@@ -9,9 +9,16 @@ Returns the image directly — the URL itself is the image source.
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Tuple
 from urllib.parse import quote
 
+from ..schemas import PersonaType
+
 logger = logging.getLogger(__name__)
 
 # ── Prompt Templates ──────────────────────────────────────────────────────────
@@ -39,6 +46,9 @@ _ZH_TEMPLATE = """\
 美术风格：扁平矢量插画，色彩明亮，卡通风格友好，非写实风格。\
 """
 
+# Personas come from a closed enum: title-case them once
+_PERSONA_LABELS = {p.value: p.value.capitalize() for p in PersonaType}
+
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
@@ -63,13 +73,10 @@ def _build_prompt(language: str, itinerary_data: dict) -> str:
         persona_str = " & ".join(personas)
     else:
         day_labels = ", ".join(f"Day {d['day_number']}" for d in days) if days else "Day 1"
-        persona_str = " & ".join(p.capitalize() for p in personas)
+        persona_str = " & ".join(_PERSONA_LABELS.get(p) or p.capitalize() for p in personas)
 
-    # Collect top POI names (up to 6 total across all days)
-    all_pois = []
-    for day in days:
-        all_pois.extend(day.get("pois", []))
-    top_pois = all_pois[:6]
+    # Top POI names (up to 6 total across all days), without copying the rest
+    top_pois = list(islice(chain.from_iterable(d.get("pois", ()) for d in days), 6))
 
     if language == "zh":
         poi_labels = "、".join(f"「{p}」" for p in top_pois) if top_pois else f"「{destination}热门景点」"
@@ -88,6 +95,30 @@ def _build_prompt(language: str, itinerary_data: dict) -> str:
     )
 
 
+def _prompt_seed(prompt: str) -> int:
+    """Process-stable seed (builtin ``hash`` is salted per process)."""
+    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % 99991
+
+
+@lru_cache(maxsize=512)
+def _poster_url(language: str, itinerary_json: str, width: int, height: int) -> Tuple[str, str]:
+    """Return ``(prompt, image_url)``; keyed on the canonical itinerary JSON."""
+    prompt = _build_prompt(language, json.loads(itinerary_json))
+    logger.info("Pollinations prompt (%s): %s", language, prompt[:120])
+
+    encoded = quote(prompt, safe="")
+    # Use a deterministic seed so re-generating the same itinerary gives the
+    # same image (and hits Pollinations' cache) across restarts.
+    seed = _prompt_seed(prompt)
+
+    image_url = (
+        f"https://image.pollinations.ai/prompt/{encoded}"
+        f"?width={width}&height={height}&model=flux&nologo=true&seed={seed}"
+    )
+    return prompt, image_url
+
+
 # ── Main API call ─────────────────────────────────────────────────────────────
 
 def generate_travel_poster(
@@ -111,18 +142,8 @@ def generate_travel_poster(
             "error": str | None,
         }
     """
-    prompt = _build_prompt(language, itinerary_data)
-    logger.info("Pollinations prompt (%s): %s", language, prompt[:120])
-
-    encoded = quote(prompt, safe="")
-    # Use a deterministic seed so re-generating the same itinerary gives the
-    # same image; abs() keeps it positive, modulo keeps it reasonable.
-    seed = abs(hash(prompt)) % 99991
-
-    image_url = (
-        f"https://image.pollinations.ai/prompt/{encoded}"
-        f"?width={width}&height={height}&model=flux&nologo=true&seed={seed}"
-    )
+    itinerary_json = json.dumps(itinerary_data, sort_keys=True, ensure_ascii=False)
+    prompt, image_url = _poster_url(language, itinerary_json, width, height)
 
     return {
         "success": True,
@@ -8,13 +8,233 @@ MCP Tool that produces two output artefacts:
 Both tools degrade gracefully: plain-text / GeoJSON fallbacks are
 used when the optional dependencies are not installed.
 """
-import json
+import io
 import os
+import tempfile
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List
+from functools import lru_cache
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import (
+        HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
+    )
+    _REPORTLAB_OK = True
+except ImportError:
+    _REPORTLAB_OK = False
+
+try:
+    import folium
+    from branca.element import MacroElement
+    from jinja2 import Template
+
+    class _RouteLayer(MacroElement):
+        """
+        All stop markers and day polylines as one data array plus a short
+        Leaflet loop, instead of a Marker / PolyLine element (and template
+        render) per stop.
+        """
+        _template = Template("""
+            {% macro script(this, kwargs) %}
+            (function (map, data) {
+                data.stops.forEach(function (s) {
+                    L.marker([s[0], s[1]], {icon: L.divIcon({
+                        html: data.icons[s[2]], className: "empty",
+                        iconSize: [30, 30], iconAnchor: [15, 15]})})
+                     .bindPopup(s[3], {maxWidth: 240})
+                     .bindTooltip(s[4], {sticky: true})
+                     .addTo(map);
+                });
+                data.routes.forEach(function (r) {
+                    L.polyline(r[1], {color: r[0], weight: 3, opacity: 0.75})
+                     .bindTooltip(r[2], {sticky: true})
+                     .addTo(map);
+                });
+            })({{ this._parent.get_name() }}, {{ this.data }});
+            {% endmacro %}
+        """)
+
+        def __init__(self, data: dict):
+            super().__init__()
+            self._name = "RouteLayer"
+            # "</" would close the surrounding <script> early
+            self.data = orjson.dumps(data).decode().replace("</", "<\\/")
+
+    _FOLIUM_OK = True
+except ImportError:
+    _FOLIUM_OK = False
 
 OUTPUTS_DIR = "outputs"
 
+# Inline markup for the detail / note lines under each stop's name
+_NOTE_FONT = '<font name="Helvetica" size="9" color="#555555">'
+
+# Map marker templates, filled per stop with str.format_map
+_ICON_TMPL = (
+    '<div style="background:{color};color:white;border-radius:50%;'
+    'width:30px;height:30px;display:flex;align-items:center;'
+    'justify-content:center;font-weight:bold;font-size:11px;'
+    'box-shadow:0 2px 6px rgba(0,0,0,.3);">D{day}</div>'
+)
+_POPUP_TMPL = (
+    '<div style="font-family:sans-serif;min-width:190px;">'
+    '<h4 style="color:{color};margin:0 0 4px 0">'
+    'Day {day} · Stop {stop}</h4>'
+    '<b>{name}</b>{addr}{score}{note}</div>'
+)
+
+# Route colour per day (cycled) and the fixed parts of the map legend
+_DAY_COLORS = ("#E8335D", "#3498DB", "#2ECC71", "#9B59B6",
+               "#F39C12", "#1ABC9C", "#E74C3C", "#34495E")
+_N_DAY_COLORS = len(_DAY_COLORS)
+
+_LEGEND_PREFIX = (
+    '<div style="position:fixed;bottom:30px;right:30px;background:white;'
+    'padding:14px;border-radius:10px;box-shadow:0 2px 10px rgba(0,0,0,.2);'
+    'font-family:sans-serif;z-index:1000;">'
+    '<div style="font-weight:bold;font-size:13px;color:#E8335D;margin-bottom:6px;">'
+    '🗺️ Click2GO Route</div>'
+)
+_LEGEND_SUFFIX = "</div>"
+_LEGEND_ITEM_TMPL = (
+    '<div style="margin-top:5px;">'
+    '<span style="background:{color};color:white;'
+    'padding:2px 8px;border-radius:10px;font-size:11px;">Day {day}</span> '
+    '{stops} stops</div>'
+)
+
+# Five-star rating strings for a 0–10 persona score, indexed by score // 2
+_STAR_TABLE = tuple("★" * i + "☆" * (5 - i) for i in range(6))
+
+
+@dataclass(frozen=True)
+class _Styles:
+    red:         object
+    title:       object
+    sub:         object
+    day:         object
+    poi:         object
+    footer:      object
+    stats_table: object
+
+
+@lru_cache(maxsize=1)
+def _styles() -> _Styles:
+    """ReportLab paragraph / table styles, built once and shared by every PDF."""
+    sheet = getSampleStyleSheet()
+    red   = colors.HexColor("#E8335D")
+
+    def ps(name, parent="Normal", **kw):
+        return ParagraphStyle(name, parent=sheet[parent], **kw)
+
+    return _Styles(
+        red    = red,
+        title  = ps("Title2",   "Title",   fontSize=28, textColor=red, spaceAfter=4),
+        sub    = ps("Sub",      fontSize=11, textColor=colors.HexColor("#666666"), spaceAfter=18),
+        day    = ps("Day",      "Heading1", fontSize=17, textColor=red, spaceBefore=14, spaceAfter=6),
+        poi    = ps("POI",      "Heading2", fontSize=12, textColor=colors.HexColor("#222222"),
+                    spaceBefore=7, spaceAfter=3),
+        footer = ps("Footer",   fontSize=8,  textColor=colors.HexColor("#AAAAAA"), alignment=1),
+        stats_table = TableStyle([
+            ("BACKGROUND",   (0, 0), (-1, 0), red),
+            ("TEXTCOLOR",    (0, 0), (-1, 0), colors.white),
+            ("ALIGN",        (0, 0), (-1, -1), "CENTER"),
+            ("FONTSIZE",     (0, 0), (-1, 0), 10),
+            ("FONTSIZE",     (0, 1), (-1, 1), 18),
+            ("FONTNAME",     (0, 1), (-1, 1), "Helvetica-Bold"),
+            ("BACKGROUND",   (0, 1), (-1, 1), colors.HexColor("#FFF5F7")),
+            ("BOX",          (0, 0), (-1, -1), 1, red),
+            ("INNERGRID",    (0, 0), (-1, -1), 0.5, colors.HexColor("#FFCCCC")),
+            ("TOPPADDING",   (0, 0), (-1, -1), 7),
+            ("BOTTOMPADDING",(0, 0), (-1, -1), 7),
+        ]),
+    )
+
+
+def _day_headers(start_date: str, num_days: int) -> List[str]:
+    """'Day N — Weekday, Month DD' per day, or plain 'Day N' without a valid start date."""
+    try:
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return [f"Day {i}" for i in range(1, num_days + 1)]
+    return [
+        f"Day {i + 1} — {(start_dt + timedelta(days=i)).strftime('%A, %B %d')}"
+        for i in range(num_days)
+    ]
+
+
+def _write_atomic(out_path: str, data) -> None:
+    """
+    Write ``data`` next to ``out_path`` and rename it into place, so readers
+    (the /outputs mount, a concurrent export) never see a half-written file.
+    """
+    # Unique temp name per write: concurrent exports of the same target must
+    # not interleave in one temp file
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(out_path) or ".",
+        prefix=os.path.basename(out_path) + ".", suffix=".part",
+    )
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class _Stop(NamedTuple):
+    """The POI fields the exporters read, unpacked from the dict once per stop."""
+    name:          Optional[str]
+    address:       Optional[str]
+    category:      Optional[str]
+    lat:           Optional[float]
+    lng:           Optional[float]
+    persona_score: Optional[float]
+    agent_note:    Optional[str]
+
+
+def _as_stops(days: List[List[dict]]) -> List[List[_Stop]]:
+    return [
+        [
+            _Stop(p.get("name"), p.get("address"), p.get("category"), p.get("lat"),
+                  p.get("lng"), p.get("persona_score"), p.get("agent_note"))
+            for p in day_pois
+        ]
+        for day_pois in days
+    ]
+
+
+def _geo_stops(days: List[List[_Stop]]) -> List[Tuple[int, int, _Stop]]:
+    """``(day_idx, stop_idx, stop)`` for every stop with coordinates, in day order."""
+    return [
+        (di, si, stop)
+        for di, day_pois in enumerate(days)
+        for si, stop in enumerate(day_pois)
+        if stop.lat is not None and stop.lng is not None
+    ]
+
+
+def _render_legend(days: List[List[_Stop]], dest: str) -> str:
+    """Fixed-position map legend: destination plus one coloured row per day."""
+    items = "".join(
+        _LEGEND_ITEM_TMPL.format(color=_DAY_COLORS[i % _N_DAY_COLORS], day=i + 1, stops=len(day))
+        for i, day in enumerate(days)
+    )
+    return f'{_LEGEND_PREFIX}<div style="font-size:11px;color:#888">{dest}</div>{items}{_LEGEND_SUFFIX}'
+
 
 class ItineraryExporter:
 
@@ -29,170 +249,134 @@ class ItineraryExporter:
 
         Returns the path to the created file.
         """
-        try:
-            return self._build_pdf(itinerary, user_profile)
-        except ImportError:
+        if not _REPORTLAB_OK:
             return self._text_fallback(itinerary, user_profile)
+        return self._build_pdf(itinerary, user_profile)
 
     def _build_pdf(self, itinerary: dict, user_profile: dict) -> str:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-        from reportlab.lib.units import cm
-        from reportlab.platypus import (
-            HRFlowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
-        )
-
         session_id  = itinerary.get("session_id", "unknown")
         out_path    = os.path.join(OUTPUTS_DIR, f"itinerary_{session_id[:8]}.pdf")
 
-        doc    = SimpleDocTemplate(out_path, pagesize=A4,
+        buf    = io.BytesIO()
+        doc    = SimpleDocTemplate(buf, pagesize=A4,
                                    leftMargin=2*cm, rightMargin=2*cm,
                                    topMargin=2*cm, bottomMargin=2*cm)
-        styles = getSampleStyleSheet()
-        RED    = colors.HexColor("#E8335D")
-
-        # ── Custom styles
-        def ps(name, parent="Normal", **kw):
-            return ParagraphStyle(name, parent=styles[parent], **kw)
-
-        title_sty   = ps("Title2",   "Title",   fontSize=28, textColor=RED, spaceAfter=4)
-        sub_sty     = ps("Sub",      fontSize=11, textColor=colors.HexColor("#666666"), spaceAfter=18)
-        day_sty     = ps("Day",      "Heading1", fontSize=17, textColor=RED, spaceBefore=14, spaceAfter=6)
-        poi_sty     = ps("POI",      "Heading2", fontSize=12, textColor=colors.HexColor("#222222"),
-                         spaceBefore=7, spaceAfter=3)
-        note_sty    = ps("Note",     fontSize=9,  textColor=colors.HexColor("#555555"),
-                         leftIndent=16)
-        footer_sty  = ps("Footer",   fontSize=8,  textColor=colors.HexColor("#AAAAAA"), alignment=1)
-
-        story = []
+        sty    = _styles()
+
+        days    = _as_stops(itinerary.get("days", []))
+        headers = _day_headers(user_profile.get("start_date", ""), len(days))
+
+        # The section generators only keep each part of the report in its own
+        # method: doc.build needs the complete story list before layout starts
+        doc.build(list(chain(
+            self._header_flowables(user_profile, sty),
+            self._stats_flowables(itinerary.get("stats", {}), sty),
+            chain.from_iterable(
+                self._day_flowables(header, day_pois, sty)
+                for header, day_pois in zip(headers, days)
+                if day_pois
+            ),
+            self._footer_flowables(sty),
+        )))
+        _write_atomic(out_path, buf.getbuffer())
+        return out_path
 
-        # ── Header
+    @staticmethod
+    def _header_flowables(user_profile: dict, sty: "_Styles") -> Iterator:
         dest       = user_profile.get("destination", "Your Destination")
         start_date = user_profile.get("start_date", "")
         end_date   = user_profile.get("end_date", "")
         persona    = user_profile.get("persona", "chilling").capitalize()
 
-        story.append(Paragraph("Click2GO", title_sty))
-        story.append(Paragraph(
+        yield Paragraph("Click2GO", sty.title)
+        yield Paragraph(
             f"{dest} &nbsp;·&nbsp; {start_date} → {end_date} &nbsp;·&nbsp; {persona} Style",
-            sub_sty,
-        ))
-        story.append(HRFlowable(width="100%", thickness=2, color=RED))
-        story.append(Spacer(1, 10))
-
-        # ── Stats table
-        stats = itinerary.get("stats", {})
-        if stats:
-            tbl = Table(
+            sty.sub,
+        )
+        yield HRFlowable(width="100%", thickness=2, color=sty.red)
+        yield Spacer(1, 10)
+
+    @staticmethod
+    def _stats_flowables(stats: dict, sty: "_Styles") -> Iterator:
+        if not stats:
+            return
+        tbl = Table(
+            [
+                ["POIs Discovered", "POIs Verified", "POIs Included"],
                 [
-                    ["POIs Discovered", "POIs Verified", "POIs Included"],
-                    [
-                        str(stats.get("total_scraped", "–")),
-                        str(stats.get("total_verified", "–")),
-                        str(stats.get("total_included", "–")),
-                    ],
+                    str(stats.get("total_scraped", "–")),
+                    str(stats.get("total_verified", "–")),
+                    str(stats.get("total_included", "–")),
                 ],
-                colWidths=[5*cm, 5*cm, 5*cm],
-            )
-            tbl.setStyle(TableStyle([
-                ("BACKGROUND",   (0, 0), (-1, 0), RED),
-                ("TEXTCOLOR",    (0, 0), (-1, 0), colors.white),
-                ("ALIGN",        (0, 0), (-1, -1), "CENTER"),
-                ("FONTSIZE",     (0, 0), (-1, 0), 10),
-                ("FONTSIZE",     (0, 1), (-1, 1), 18),
-                ("FONTNAME",     (0, 1), (-1, 1), "Helvetica-Bold"),
-                ("BACKGROUND",   (0, 1), (-1, 1), colors.HexColor("#FFF5F7")),
-                ("BOX",          (0, 0), (-1, -1), 1, RED),
-                ("INNERGRID",    (0, 0), (-1, -1), 0.5, colors.HexColor("#FFCCCC")),
-                ("TOPPADDING",   (0, 0), (-1, -1), 7),
-                ("BOTTOMPADDING",(0, 0), (-1, -1), 7),
-            ]))
-            story.append(tbl)
-            story.append(Spacer(1, 18))
-
-        # ── Daily itinerary
-        days = itinerary.get("days", [])
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        except Exception:
-            start_dt = None
-
-        for day_num, day_pois in enumerate(days, 1):
-            if not day_pois:
-                continue
-            date_str = ""
-            if start_dt:
-                d = start_dt + timedelta(days=day_num - 1)
-                date_str = f" — {d.strftime('%A, %B %d')}"
-
-            story.append(Paragraph(f"Day {day_num}{date_str}", day_sty))
-            story.append(HRFlowable(width="100%", thickness=0.5,
-                                     color=colors.HexColor("#FFAAAA")))
-            story.append(Spacer(1, 5))
-
-            for stop_num, poi in enumerate(day_pois, 1):
-                name = poi.get("name", "Unknown Location")
-                story.append(Paragraph(f"{stop_num}. {name}", poi_sty))
-
-                details = []
-                if poi.get("address"):
-                    details.append(f"📍 {poi['address']}")
-                if poi.get("category"):
-                    details.append(f"🏷️ {poi['category']}")
-                score = poi.get("persona_score")
-                if score is not None:
-                    stars = "★" * int(score / 2) + "☆" * (5 - int(score / 2))
-                    details.append(f"⭐ {stars} ({score:.1f}/10)")
-                if details:
-                    story.append(Paragraph(" &nbsp;|&nbsp; ".join(details), note_sty))
-
-                if poi.get("agent_note"):
-                    story.append(Paragraph(f"🤖 {poi['agent_note']}", note_sty))
-
-                story.append(Spacer(1, 5))
-
-            story.append(Spacer(1, 8))
-
-        # ── Footer
-        story.append(HRFlowable(width="100%", thickness=1,
-                                  color=colors.HexColor("#CCCCCC")))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph(
+            ],
+            colWidths=[5*cm, 5*cm, 5*cm],
+        )
+        tbl.setStyle(sty.stats_table)
+        yield tbl
+        yield Spacer(1, 18)
+
+    @staticmethod
+    def _day_flowables(header: str, day_pois: List[_Stop], sty: "_Styles") -> Iterator:
+        yield Paragraph(header, sty.day)
+        yield HRFlowable(width="100%", thickness=0.5, color=colors.HexColor("#FFAAAA"))
+        yield Spacer(1, 5)
+
+        for stop_num, poi in enumerate(day_pois, 1):
+            # One flowable per stop: name, details and note as inline markup
+            details = []
+            if poi.address:
+                details.append(f"📍 {poi.address}")
+            if poi.category:
+                details.append(f"🏷️ {poi.category}")
+            score = poi.persona_score
+            if score is not None:
+                stars = _STAR_TABLE[max(0, min(5, int(score / 2)))]
+                details.append(f"⭐ {stars} ({score:.1f}/10)")
+
+            lines = [f"{stop_num}. {poi.name or 'Unknown Location'}"]
+            if details:
+                lines.append(f"{_NOTE_FONT}{' &nbsp;|&nbsp; '.join(details)}</font>")
+            if poi.agent_note:
+                lines.append(f"{_NOTE_FONT}🤖 {poi.agent_note}</font>")
+            yield Paragraph("<br/>".join(lines), sty.poi)
+            yield Spacer(1, 5)
+
+        yield Spacer(1, 8)
+
+    @staticmethod
+    def _footer_flowables(sty: "_Styles") -> Iterator:
+        yield HRFlowable(width="100%", thickness=1, color=colors.HexColor("#CCCCCC"))
+        yield Spacer(1, 6)
+        yield Paragraph(
             f"Generated by Click2GO · {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-            footer_sty,
-        ))
-        story.append(Paragraph(
+            sty.footer,
+        )
+        yield Paragraph(
             "Powered by Xiaohongshu social intelligence + Claude AI verification",
-            footer_sty,
-        ))
-
-        doc.build(story)
-        return out_path
+            sty.footer,
+        )
 
     def _text_fallback(self, itinerary: dict, user_profile: dict) -> str:
         """Plain-text itinerary when ReportLab is not installed."""
         sid      = itinerary.get("session_id", "unknown")
         out_path = os.path.join(OUTPUTS_DIR, f"itinerary_{sid[:8]}.txt")
-        dest     = user_profile.get("destination", "")
-        lines    = [
-            "=" * 60, "CLICK2GO TRAVEL ITINERARY", "=" * 60,
-            f"Destination : {dest}",
-            f"Dates       : {user_profile.get('start_date', '')} → {user_profile.get('end_date', '')}",
-            f"Persona     : {user_profile.get('persona', 'chilling').capitalize()}",
-            "",
-        ]
-        for day_num, day_pois in enumerate(itinerary.get("days", []), 1):
-            lines.append(f"\n--- DAY {day_num} ---")
+        rule     = "=" * 60 + "\n"
+        out      = io.StringIO()
+        w        = out.write
+        w(f"{rule}CLICK2GO TRAVEL ITINERARY\n{rule}")
+        w(f"Destination : {user_profile.get('destination', '')}\n")
+        w(f"Dates       : {user_profile.get('start_date', '')} → {user_profile.get('end_date', '')}\n")
+        w(f"Persona     : {user_profile.get('persona', 'chilling').capitalize()}\n")
+        for day_num, day_pois in enumerate(_as_stops(itinerary.get("days", [])), 1):
+            w(f"\n\n--- DAY {day_num} ---")
             for i, poi in enumerate(day_pois, 1):
-                lines.append(f"  {i}. {poi.get('name', 'Unknown')}")
-                if poi.get("address"):
-                    lines.append(f"     📍 {poi['address']}")
-                if poi.get("agent_note"):
-                    lines.append(f"     🤖 {poi['agent_note']}")
-        lines += ["", "=" * 60, "Generated by Click2GO", "=" * 60]
-        with open(out_path, "w", encoding="utf-8") as fh:
-            fh.write("\n".join(lines))
+                w(f"\n  {i}. {poi.name or 'Unknown'}")
+                if poi.address:
+                    w(f"\n     📍 {poi.address}")
+                if poi.agent_note:
+                    w(f"\n     🤖 {poi.agent_note}")
+        w(f"\n\n{rule}Generated by Click2GO\n{rule[:-1]}")
+        _write_atomic(out_path, out.getvalue().encode("utf-8"))
         return out_path
 
     # ── Map ───────────────────────────────────────────────────────────────────
@@ -203,113 +387,81 @@ class ItineraryExporter:
 
         Returns the path to the created file.
         """
-        try:
-            return self._build_map(itinerary, user_profile)
-        except ImportError:
+        if not _FOLIUM_OK:
             return self._geojson_fallback(itinerary)
+        return self._build_map(itinerary, user_profile)
 
     def _build_map(self, itinerary: dict, user_profile: dict) -> str:
-        import folium
-
         sid      = itinerary.get("session_id", "unknown")
         out_path = os.path.join(OUTPUTS_DIR, f"map_{sid[:8]}.html")
-        days     = itinerary.get("days", [])
+        days     = _as_stops(itinerary.get("days", []))
         dest     = user_profile.get("destination", "Destination")
 
-        # Map centre
-        all_geo = [p for day in days for p in day if p.get("lat") and p.get("lng")]
-        if all_geo:
-            c_lat = sum(p["lat"] for p in all_geo) / len(all_geo)
-            c_lng = sum(p["lng"] for p in all_geo) / len(all_geo)
+        geo_stops = _geo_stops(days)
+
+        # Map centre: mean of all geocoded stops, in one pass
+        if geo_stops:
+            s_lat = s_lng = 0.0
+            for _, _, p in geo_stops:
+                s_lat += p.lat
+                s_lng += p.lng
+            c_lat, c_lng = s_lat / len(geo_stops), s_lng / len(geo_stops)
         else:
             c_lat, c_lng = 35.6762, 139.6503   # default Tokyo
 
         m = folium.Map(location=[c_lat, c_lng], zoom_start=13, tiles="CartoDB positron")
 
-        DAY_COLORS = ["#E8335D", "#3498DB", "#2ECC71", "#9B59B6",
-                      "#F39C12", "#1ABC9C", "#E74C3C", "#34495E"]
-
-        for di, day_pois in enumerate(days):
-            color    = DAY_COLORS[di % len(DAY_COLORS)]
-            day_geo  = [p for p in day_pois if p.get("lat") and p.get("lng")]
-
-            for si, poi in enumerate(day_pois):
-                if not (poi.get("lat") and poi.get("lng")):
-                    continue
-
-                icon_html = (
-                    f'<div style="background:{color};color:white;border-radius:50%;'
-                    f'width:30px;height:30px;display:flex;align-items:center;'
-                    f'justify-content:center;font-weight:bold;font-size:11px;'
-                    f'box-shadow:0 2px 6px rgba(0,0,0,.3);">D{di+1}</div>'
-                )
-                popup_html = (
-                    f'<div style="font-family:sans-serif;min-width:190px;">'
-                    f'<h4 style="color:{color};margin:0 0 4px 0">'
-                    f'Day {di+1} · Stop {si+1}</h4>'
-                    f'<b>{poi.get("name","")}</b>'
-                    + (f'<br><small>📍 {poi["address"]}</small>' if poi.get("address") else "")
-                    + (f'<br><small>⭐ {poi["persona_score"]:.1f}/10</small>'
-                       if poi.get("persona_score") else "")
-                    + (f'<br><i style="color:#666">{poi["agent_note"][:100]}</i>'
-                       if poi.get("agent_note") else "")
-                    + "</div>"
-                )
-
-                folium.Marker(
-                    [poi["lat"], poi["lng"]],
-                    popup=folium.Popup(popup_html, max_width=240),
-                    tooltip=f"Day {di+1}: {poi.get('name', '')}",
-                    icon=folium.DivIcon(html=icon_html, icon_size=(30, 30), icon_anchor=(15, 15)),
-                ).add_to(m)
+        icons: List[str] = []     # one marker icon per day, shared by its stops
+        markers: List[list] = []
+        routes: List[list] = []
+        for di, stops in groupby(geo_stops, key=itemgetter(0)):
+            color = _DAY_COLORS[di % _N_DAY_COLORS]
+            icons.append(_ICON_TMPL.format(color=color, day=di + 1))
+            day_geo = []
+
+            for _, si, poi in stops:
+                day_geo.append([poi.lat, poi.lng])
+                popup_html = _POPUP_TMPL.format_map({
+                    "color": color,
+                    "day":   di + 1,
+                    "stop":  si + 1,
+                    "name":  poi.name or "",
+                    "addr":  f'<br><small>📍 {poi.address}</small>' if poi.address else "",
+                    "score": (f'<br><small>⭐ {poi.persona_score:.1f}/10</small>'
+                              if poi.persona_score else ""),
+                    "note":  (f'<br><i style="color:#666">{poi.agent_note[:100]}</i>'
+                              if poi.agent_note else ""),
+                })
+
+                markers.append([poi.lat, poi.lng, len(icons) - 1, popup_html,
+                                f"Day {di+1}: {poi.name or ''}"])
 
             # Route polyline
             if len(day_geo) > 1:
-                folium.PolyLine(
-                    [[p["lat"], p["lng"]] for p in day_geo],
-                    color=color, weight=3, opacity=0.75,
-                    tooltip=f"Day {di+1} route",
-                ).add_to(m)
-
-        # Legend
-        legend_items = "".join(
-            f'<div style="margin-top:5px;">'
-            f'<span style="background:{DAY_COLORS[i % len(DAY_COLORS)]};color:white;'
-            f'padding:2px 8px;border-radius:10px;font-size:11px;">Day {i+1}</span> '
-            f'{len(days[i])} stops</div>'
-            for i in range(len(days))
-        )
-        m.get_root().html.add_child(folium.Element(
-            f'<div style="position:fixed;bottom:30px;right:30px;background:white;'
-            f'padding:14px;border-radius:10px;box-shadow:0 2px 10px rgba(0,0,0,.2);'
-            f'font-family:sans-serif;z-index:1000;">'
-            f'<div style="font-weight:bold;font-size:13px;color:#E8335D;margin-bottom:6px;">'
-            f'🗺️ Click2GO Route</div>'
-            f'<div style="font-size:11px;color:#888">{dest}</div>'
-            f'{legend_items}</div>'
-        ))
-
-        m.save(out_path)
+                routes.append([color, day_geo, f"Day {di+1} route"])
+
+        m.add_child(_RouteLayer({"icons": icons, "stops": markers, "routes": routes}))
+        m.get_root().html.add_child(folium.Element(_render_legend(days, dest)))
+
+        _write_atomic(out_path, m.get_root().render().encode("utf-8"))
         return out_path
 
     def _geojson_fallback(self, itinerary: dict) -> str:
         sid      = itinerary.get("session_id", "unknown")
         out_path = os.path.join(OUTPUTS_DIR, f"map_{sid[:8]}.geojson")
-        features = []
-        for di, day_pois in enumerate(itinerary.get("days", [])):
-            for poi in day_pois:
-                if poi.get("lat") and poi.get("lng"):
-                    features.append({
-                        "type": "Feature",
-                        "geometry": {"type": "Point",
-                                     "coordinates": [poi["lng"], poi["lat"]]},
-                        "properties": {
-                            "name": poi.get("name", ""),
-                            "day":  di + 1,
-                            "note": poi.get("agent_note", ""),
-                        },
-                    })
-        with open(out_path, "w", encoding="utf-8") as fh:
-            json.dump({"type": "FeatureCollection", "features": features},
-                      fh, ensure_ascii=False, indent=2)
+        features = [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point",
+                             "coordinates": [poi.lng, poi.lat]},
+                "properties": {
+                    "name": poi.name or "",
+                    "day":  di + 1,
+                    "note": poi.agent_note or "",
+                },
+            }
+            for di, _, poi in _geo_stops(_as_stops(itinerary.get("days", [])))
+        ]
+        _write_atomic(out_path, orjson.dumps({"type": "FeatureCollection", "features": features},
+                                             option=orjson.OPT_INDENT_2))
         return out_path
@@ -4,12 +4,63 @@ Map Tool
 MCP Tool wrapping Google Maps (global) and a Haversine fallback.
 Provides geocoding and distance utilities for the route optimizer.
 """
+import asyncio
+import hashlib
 import math
-import random
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
 from typing import Dict, List, Optional, Tuple
 
+import httpx
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+from ..clients import get_http_client
 from ..config import settings
 
+_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+_GEOCODE_CONCURRENCY = 10
+_GEOCODE_TIMEOUT     = 10    # seconds
+
+
+class _LRUCache:
+    """Small thread-safe LRU map; the least recently used key goes first."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Tuple[float, float]) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Live Google results keyed by normalised address, shared across sessions and
+# bounded like the mock memo below. Mock results are memoised separately
+# (``_mock_geocode_cached``); their jitter is a pure function of the address,
+# so distinct ones still spread.
+_geocode_cache = _LRUCache(maxsize=4096)
+
 # Approximate city centres for offline/mock geocoding
 _CITY_COORDS: Dict[str, Tuple[float, float]] = {
     # Asia
@@ -84,13 +135,41 @@ _CITY_COORDS: Dict[str, Tuple[float, float]] = {
     "cape town":   (-33.9249,  18.4241),
 }
 
+# All city names as one alternation, longest first so "hong kong" wins over
+# any shorter name it contains: one C-level scan per address
+_CITIES_LOWER = {city.lower(): coords for city, coords in _CITY_COORDS.items()}
+_CITY_RE = re.compile("|".join(
+    re.escape(city) for city in sorted(_CITIES_LOWER, key=len, reverse=True)
+))
+# Most addresses start with the city ("Tokyo, Japan"): a dict hit on the
+# leading word answers those without the scan. Words that open a multi-word
+# name ("new", "los", …) always go to the regex.
+_LEADING_WORD_RE = re.compile(r"[^\W\d_]+")
+_MULTIWORD_HEADS = frozenset(city.split()[0] for city in _CITIES_LOWER if " " in city)
+
+
+def _haversine_py(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    R = 6371.0
+    φ1, φ2 = math.radians(lat1), math.radians(lat2)
+    dφ = math.radians(lat2 - lat1)
+    dλ = math.radians(lng2 - lng1)
+    a = math.sin(dφ / 2) ** 2 + math.cos(φ1) * math.cos(φ2) * math.sin(dλ / 2) ** 2
+    return R * 2 * math.asin(math.sqrt(a))
+
+
+# Great-circle distance in km; compiled to native code when Numba is installed
+if numba is not None:
+    _haversine_km = numba.njit(cache=True, fastmath=True)(_haversine_py)
+else:
+    _haversine_km = _haversine_py
+
 
 class MapTool:
     """
     Geocoding and routing utilities.
 
     Uses the Google Maps Python client when GOOGLE_MAPS_API_KEY is set;
-    otherwise falls back to a city-lookup table + small random jitter so
+    otherwise falls back to a city-lookup table + small per-address jitter so
     that the route-optimiser still gets plausible lat/lng values.
     """
 
@@ -111,38 +190,77 @@ class MapTool:
 
         Returns None if geocoding fails.
         """
+        key = self._address_key(address)
         if self._gmaps:
+            cached = _geocode_cache.get(key)
+            if cached is not None:
+                return cached
             try:
                 results = self._gmaps.geocode(address)
                 if results:
                     loc = results[0]["geometry"]["location"]
-                    return (loc["lat"], loc["lng"])
+                    coords = (loc["lat"], loc["lng"])
+                    _geocode_cache.put(key, coords)
+                    return coords
             except Exception:
                 pass
 
-        return self._mock_geocode(address)
+        return _mock_geocode_cached(key)
+
+    async def geocode_async(self, address: str) -> Optional[Tuple[float, float]]:
+        """Awaitable :meth:`geocode` for a single address."""
+        return (await self.geocode_batch([address]))[0]
+
+    async def geocode_batch(self, addresses: List[str]) -> List[Optional[Tuple[float, float]]]:
+        """
+        Geocode many addresses concurrently over the shared connection pool.
+
+        Returns one result per input address, in the same order.
+        """
+        if not settings.google_maps_api_key:
+            return [_mock_geocode_cached(self._address_key(a)) for a in addresses]
+
+        keys   = [self._address_key(a) for a in addresses]
+        found  = {k: c for k in set(keys) if (c := _geocode_cache.get(k)) is not None}
+        misses = {k: a for k, a in zip(keys, addresses) if k not in found}
+        if misses:
+            client = get_http_client()
+            sem = asyncio.Semaphore(_GEOCODE_CONCURRENCY)
+
+            async def fetch(key: str, address: str) -> None:
+                async with sem:
+                    coords = await self._google_geocode(client, address)
+                if coords:
+                    found[key] = coords
+                    _geocode_cache.put(key, coords)
+
+            await asyncio.gather(*(fetch(k, a) for k, a in misses.items()))
+
+        # Read this batch's results locally: a large batch may already have
+        # pushed some of them out of the shared cache
+        return [found.get(k) or _mock_geocode_cached(k) for k in keys]
 
     def calculate_distance(self, poi1: dict, poi2: dict) -> Optional[float]:
         """
         Haversine distance (km) between two POIs.
         """
-        if not (poi1.get("lat") and poi1.get("lng")
-                and poi2.get("lat") and poi2.get("lng")):
+        if None in (poi1.get("lat"), poi1.get("lng"), poi2.get("lat"), poi2.get("lng")):
             return None
-        return self._haversine(poi1["lat"], poi1["lng"], poi2["lat"], poi2["lng"])
+        return _haversine_km(poi1["lat"], poi1["lng"], poi2["lat"], poi2["lng"])
 
     def get_directions_url(self, pois: List[dict]) -> Optional[str]:
         """
         Build a Google Maps directions URL for an ordered list of POIs.
         """
-        geo = [p for p in pois if p.get("lat") and p.get("lng")]
+        geo = [p for p in pois if p.get("lat") is not None and p.get("lng") is not None]
         if len(geo) < 2:
             return None
 
-        pts = [f"{p['lat']},{p['lng']}" for p in geo]
-        origin, dest = pts[0], pts[-1]
-        if len(pts) > 2:
-            wps = "|".join(pts[1:-1])
+        o, d   = geo[0], geo[-1]
+        origin = f"{o['lat']},{o['lng']}"
+        dest   = f"{d['lat']},{d['lng']}"
+        if len(geo) > 2:
+            wps = "|".join(f"{p['lat']},{p['lng']}" for p in islice(geo, 1, len(geo) - 1))
             return f"https://www.google.com/maps/dir/{origin}/{dest}?waypoints={wps}"
         return f"https://www.google.com/maps/dir/{origin}/{dest}"
 
@@ -150,27 +268,59 @@ class MapTool:
 
     @staticmethod
     def _haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        R = 6371.0
-        φ1, φ2 = math.radians(lat1), math.radians(lat2)
-        dφ = math.radians(lat2 - lat1)
-        dλ = math.radians(lng2 - lng1)
-        a = math.sin(dφ / 2) ** 2 + math.cos(φ1) * math.cos(φ2) * math.sin(dλ / 2) ** 2
-        return R * 2 * math.asin(math.sqrt(a))
+        return _haversine_km(lat1, lng1, lat2, lng2)
+
+    @staticmethod
+    def _address_key(address: str) -> str:
+        return " ".join(address.split()).casefold()
+
+    @staticmethod
+    async def _google_geocode(
+        client: httpx.AsyncClient, address: str
+    ) -> Optional[Tuple[float, float]]:
+        try:
+            resp = await client.get(
+                _GEOCODE_URL,
+                params={"address": address, "key": settings.google_maps_api_key},
+                timeout=_GEOCODE_TIMEOUT,
+            )
+            resp.raise_for_status()
+            results = resp.json().get("results")
+            if results:
+                loc = results[0]["geometry"]["location"]
+                return (loc["lat"], loc["lng"])
+        except Exception:
+            pass
+        return None
 
     @staticmethod
     def _mock_geocode(address: str) -> Optional[Tuple[float, float]]:
         """
         Return approximate city-centre coords + small jitter.
         Enables route-optimiser testing without a live Maps API.
+
+        The jitter (±0.015°) is derived from a stable hash of the address,
+        so results are reproducible across calls and processes.
         """
         addr_lower = address.lower()
-        for city, (lat, lng) in _CITY_COORDS.items():
-            if city.lower() in addr_lower:
-                offset = 0.015
-                return (
-                    lat + random.uniform(-offset, offset),
-                    lng + random.uniform(-offset, offset),
-                )
+        lead = _LEADING_WORD_RE.match(addr_lower)
+        city = lead.group(0) if lead and lead.group(0) not in _MULTIWORD_HEADS else None
+        if city not in _CITIES_LOWER:
+            match = _CITY_RE.search(addr_lower)
+            city  = match.group(0) if match else None
+        if city:
+            lat, lng = _CITIES_LOWER[city]
+            h = hashlib.blake2b(addr_lower.encode("utf-8"), digest_size=2).digest()
+            return (
+                lat + h[0] / 255 * 0.03 - 0.015,
+                lng + h[1] / 255 * 0.03 - 0.015,
+            )
         # Unknown location — return None so the orchestrator skips geocoding
         # rather than silently placing the POI in the wrong city.
         return None
+
+
+@lru_cache(maxsize=4096)
+def _mock_geocode_cached(address_key: str) -> Optional[Tuple[float, float]]:
+    """:meth:`MapTool._mock_geocode` memoised on the normalised address."""
+    return MapTool._mock_geocode(address_key)
@@ -5,16 +5,76 @@ MCP-based wrapper around the existing XiaohongshuAPI.
 Converts raw note content into structured POI dicts and handles
 graceful degradation (mock data) when the MCP server is unavailable.
 """
+import asyncio
 import os
 import re
 import sys
-from typing import Dict, List, Optional
+import time
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Dict, Iterator, List, NotRequired, Optional, Tuple, TypedDict
 
 # Add the project root to sys.path so we can import xiaohongshu_api.py
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from ..config import settings
 
+# Bullet of a numbered / bulleted list item in travel guides (e.g. "1.", "①", "📍"),
+# matched at the start of a line.  Lines not opening with a bullet symbol or a
+# digit (\d, i.e. str.isdecimal) are rejected before the regex runs.
+_BULLET_CHARS = frozenset("①②③④⑤⑥⑦⑧⑨⑩📍")
+_POI_BULLET_RE = re.compile(r"[①②③④⑤⑥⑦⑧⑨⑩📍\d]+[\.、\s]+")
+# A symbol bullet alone on its line ("①", "📍"); bare numbers need a separator
+_BARE_BULLET_RE = re.compile(r"[①②③④⑤⑥⑦⑧⑨⑩📍\d]+")
+
+# Every str.isspace character (U+3000 is the highest code point it accepts)
+_WHITESPACE = "".join(c for c in map(chr, range(0x3001)) if c.isspace())
+# Trailing junk trimmed from list-item names in one rstrip
+_NAME_TRAILING = _WHITESPACE + "：:，,。."
+# Separator text that may open an item written on the line after its bullet
+_ITEM_LEADING = _WHITESPACE + ".、"
+
+# Address cues merged into one alternation so the window is scanned once;
+# each alternative exposes the address text through its own named group.
+_ADDRESS_RE = re.compile(
+    r"(?P<postal>〒[\d\-]+\s+[^\n]{5,80})"      # Japanese postal code
+    r"|地址[：:](?P<addr>[^\n]{5,80})"
+    r"|🏠[：:]?\s*(?P<home>[^\n]{5,80})"
+    r"|位于(?P<located>[^\n]{5,60})"
+    r"|在(?P<near>[^\n的]{3,40})[附近]"
+)
+
+# Chinese travel/persona suffixes stripped from search keywords; everything
+# from the earliest suffix onwards is dropped, so order only matters for
+# overlapping entries (longest first).
+_MOCK_SUFFIXES = ("旅游攻略", "景点推荐", "美食推荐", "拍照打卡", "户外运动", "特色小吃",
+                  "攻略", "旅游", "景点", "打卡", "美食", "咖啡", "拍照", "摄影",
+                  "徒步", "休闲", "必吃")
+_SUFFIX_RE = re.compile("|".join(map(re.escape, _MOCK_SUFFIXES)))
+
+# Keyword triggers → persona, grouped in detection priority order
+_PERSONA_TRIGGERS = {
+    "拍照": "photography", "摄影": "photography", "photography": "photography",
+    "美食": "foodie", "必吃": "foodie", "小吃": "foodie", "foodie": "foodie",
+    "徒步": "exercise", "户外": "exercise", "运动": "exercise", "exercise": "exercise",
+    "咖啡": "chilling", "休闲": "chilling", "chill": "chilling",
+}
+_PERSONA_PRIORITY = tuple(dict.fromkeys(_PERSONA_TRIGGERS.values()))
+# Triggers resolve straight to a priority rank; the best hit is the lowest rank
+_TRIGGER_RANK = {t: _PERSONA_PRIORITY.index(p) for t, p in _PERSONA_TRIGGERS.items()}
+_DEFAULT_RANK = _PERSONA_PRIORITY.index("chilling")
+_PERSONA_TRIGGER_RE = re.compile("|".join(map(re.escape, _PERSONA_TRIGGERS)))
+
+
+class ScrapedPOI(TypedDict):
+    """A POI candidate as scraped; keys match the ``models.POI`` columns."""
+    name: str
+    address: Optional[str]
+    raw_content: str
+    source_url: str
+    likes: int
+    persona_score: NotRequired[float]     # mock data only
+
 
 class SocialScraperTool:
     """
@@ -22,12 +82,26 @@ class SocialScraperTool:
 
     - search_pois(keyword, max_results)  →  List[POI dict]
     - get_recent_posts(poi_name, n)       →  List[post dict]
+
+    ``search_pois_async`` / ``get_recent_posts_async`` are the awaitable
+    variants used by the orchestrator's concurrent pipeline stages.
     """
 
+    # How long a login check result is trusted before asking the MCP server again
+    _LOGIN_TTL_S = 600.0
+    _LOGIN_RETRY_S = 60.0
+    # MCP requests in flight at once from get_recent_posts_async, across all
+    # concurrent calls on one tool (i.e. one pipeline run)
+    _NOTE_FETCH_LIMIT = 4
+    # Pause between sequential note fetches in search_pois
+    _NOTE_FETCH_DELAY_S = 1.0
+
     def __init__(self):
         self._api = None           # lazy-init
         self._login_ok = False
-        self._login_checked = False
+        self._login_expires_at = 0.0    # time.monotonic() deadline
+        self._fetch_slots: Optional[asyncio.Semaphore] = None
+        self._fetch_slots_loop: Optional[asyncio.AbstractEventLoop] = None
 
     # ── Private helpers ───────────────────────────────────────────────────────
 
@@ -41,22 +115,36 @@ class SocialScraperTool:
         return self._api
 
     def _ensure_login(self) -> bool:
-        if self._login_checked:
+        now = time.monotonic()
+        if now < self._login_expires_at:
             return self._login_ok
         api = self._get_api()
         if api is None:
-            self._login_checked = True
+            # Client not importable — nothing will change for this process
+            self._login_ok, self._login_expires_at = False, float("inf")
             return False
         try:
-            self._login_ok = api.check_login()
+            self._login_ok = bool(api.check_login())
         except Exception:
             self._login_ok = False
-        self._login_checked = True
+        # Re-check periodically so a dropped (or restored) login is noticed;
+        # failures are retried sooner than successes are re-validated.
+        ttl = self._LOGIN_TTL_S if self._login_ok else self._LOGIN_RETRY_S
+        self._login_expires_at = now + ttl
         return self._login_ok
 
+    def _get_fetch_slots(self) -> asyncio.Semaphore:
+        # One semaphore per event loop: a tool reused via the sync run()
+        # wrapper gets a fresh loop per call, and a Semaphore is loop-bound
+        loop = asyncio.get_running_loop()
+        if self._fetch_slots_loop is not loop:
+            self._fetch_slots = asyncio.Semaphore(self._NOTE_FETCH_LIMIT)
+            self._fetch_slots_loop = loop
+        return self._fetch_slots
+
     # ── Public interface ──────────────────────────────────────────────────────
 
-    def search_pois(self, keyword: str, max_results: int = 20) -> List[Dict]:
+    def search_pois(self, keyword: str, max_results: int = 20) -> List[ScrapedPOI]:
         """
         Search Xiaohongshu for travel content and extract POI candidates.
 
@@ -67,15 +155,17 @@ class SocialScraperTool:
 
         api = self._get_api()
         try:
-            notes = api.search_and_extract(keyword, max_notes=max_results, delay=1.0)
+            # Notes are fetched and parsed lazily: once enough POIs have been
+            # collected no further detail requests (or pacing sleeps) happen.
+            notes = self._iter_notes(api, keyword, max_results)
+            pois = chain.from_iterable(map(self._iter_pois_from_note, notes))
+            return list(islice(pois, max_results))
         except Exception:
             return self._mock_pois(keyword, max_results)
 
-        pois: List[Dict] = []
-        for note in notes:
-            pois.extend(self._extract_pois_from_note(note))
-
-        return pois[:max_results]
+    async def search_pois_async(self, keyword: str, max_results: int = 20) -> List[ScrapedPOI]:
+        """Awaitable :meth:`search_pois`; the blocking MCP client runs in a worker thread."""
+        return await asyncio.to_thread(self.search_pois, keyword, max_results)
 
     def get_recent_posts(self, poi_name: str, num_posts: int = 5) -> List[Dict]:
         """
@@ -88,81 +178,119 @@ class SocialScraperTool:
         api = self._get_api()
         feeds = api.search(poi_name, max_results=num_posts)
 
-        posts: List[Dict] = []
-        for feed in feeds[:num_posts]:
-            try:
-                content = api.get_note_content(feed["id"], feed["xsecToken"])
-                if content:
-                    posts.append({
-                        "title":   content.get("title", ""),
-                        "content": content.get("content", ""),
-                        "id":      feed.get("id", ""),
-                        "likes":   feed.get("liked_count", 0),
-                    })
-            except Exception:
-                continue
+        posts = (self._fetch_post(api, feed) for feed in feeds[:num_posts])
+        return [p for p in posts if p]
+
+    async def get_recent_posts_async(self, poi_name: str, num_posts: int = 5) -> List[Dict]:
+        """
+        Awaitable :meth:`get_recent_posts`.
+
+        XiaohongshuAPI is a blocking ``requests`` client, so each call runs
+        in a worker thread.  The per-note detail fetches are independent
+        round-trips and run concurrently.  The search and every fetch share
+        one semaphore per tool, so however many POIs are verified at once a
+        run has at most ``_NOTE_FETCH_LIMIT`` requests in flight.  Waiting
+        happens on the event loop, not in parked worker threads.
+        """
+        if not await asyncio.to_thread(self._ensure_login):
+            return self._mock_recent_posts(poi_name, num_posts)
 
-        return posts
+        api = self._get_api()
+        slots = self._get_fetch_slots()
+        async with slots:
+            feeds = await asyncio.to_thread(api.search, poi_name, max_results=num_posts)
+
+        async def fetch(feed: Dict) -> Optional[Dict]:
+            async with slots:
+                return await asyncio.to_thread(self._fetch_post, api, feed)
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(fetch(feed)) for feed in feeds[:num_posts]]
+        return [p for p in (t.result() for t in tasks) if p]
+
+    def _iter_notes(self, api, keyword: str, max_notes: int) -> Iterator[Dict]:
+        """
+        Yield full notes for a keyword search, one detail fetch at a time.
+
+        Same requests as ``XiaohongshuAPI.search_and_extract`` (search, then
+        paced ``get_note_content`` calls) but driven by the consumer.
+        """
+        for i, feed in enumerate(api.search(keyword, max_notes)):
+            if i:
+                time.sleep(self._NOTE_FETCH_DELAY_S)
+            note = api.get_note_content(feed["id"], feed["xsecToken"])
+            if note:
+                yield note
+
+    @staticmethod
+    def _fetch_post(api, feed: Dict) -> Optional[Dict]:
+        """Fetch one note's detail and shape it as a post dict (None on failure)."""
+        try:
+            content = api.get_note_content(feed["id"], feed["xsecToken"])
+        except Exception:
+            return None
+        if not content:
+            return None
+        return {
+            "title":   content.get("title", ""),
+            "content": content.get("content", ""),
+            "id":      feed.get("id", ""),
+            "likes":   feed.get("liked_count", 0),
+        }
 
     # ── POI extraction helpers ────────────────────────────────────────────────
 
-    def _extract_pois_from_note(self, note: Dict) -> List[Dict]:
+    def _extract_pois_from_note(self, note: Dict) -> List[ScrapedPOI]:
+        """List form of :meth:`_iter_pois_from_note`."""
+        return list(self._iter_pois_from_note(note))
+
+    def _iter_pois_from_note(self, note: Dict) -> Iterator[ScrapedPOI]:
         """
-        Parse a Xiaohongshu note and extract individual POI entries.
+        Parse a Xiaohongshu note and yield individual POI entries.
         Looks for numbered / bullet-style location lists inside travel guides.
         """
         title   = note.get("title", "")
         content = note.get("content", "")
         text    = f"{title}\n{content}"
-
-        pois: List[Dict] = []
-
-        # Match numbered/bulleted list items (e.g. "1.", "①", "📍")
-        pattern = r"(?:^|\n)[①②③④⑤⑥⑦⑧⑨⑩📍\d]+[\.、\s]+([^\n]{3,60})"
-        matches = re.findall(pattern, text)
-
-        for raw_name in matches:
-            name = raw_name.strip().rstrip("：:，,。.")
+        # Per-note fields shared by every POI the note yields
+        source_url = note.get("url", "")
+        likes      = note.get("likes", 0)
+        excerpt    = text[:500]
+        extract_address = self._extract_address
+
+        found = 0
+        for raw_name in _iter_list_items(text):
+            name = raw_name.rstrip(_NAME_TRAILING).lstrip()
             if len(name) < 3 or name.isdigit():
                 continue
-            pois.append({
+            yield {
                 "name":        name[:120],
-                "address":     self._extract_address(text, name),
-                "raw_content": text[:500],
-                "source_url":  note.get("url", ""),
-                "likes":       note.get("likes", 0),
-            })
+                "address":     extract_address(text, name),
+                "raw_content": excerpt,
+                "source_url":  source_url,
+                "likes":       likes,
+            }
+            found += 1
+            if found == 5:      # cap at 5 per note to avoid duplicates
+                return
 
         # Fallback: treat the note title itself as one POI
-        if not pois and title:
-            pois.append({
+        if not found and title:
+            yield {
                 "name":        title[:120],
                 "address":     None,
                 "raw_content": content[:500],
-                "source_url":  note.get("url", ""),
-                "likes":       note.get("likes", 0),
-            })
-
-        return pois[:5]     # cap at 5 per note to avoid duplicates
+                "source_url":  source_url,
+                "likes":       likes,
+            }
 
     @staticmethod
     def _extract_address(text: str, poi_name: str) -> Optional[str]:
         """Look for an address pattern in the text near a POI name."""
-        patterns = [
-            r"[〒][\d\-]+\s+[^\n]{5,80}",   # Japanese postal code
-            r"地址[：:]([^\n]{5,80})",
-            r"🏠[：:]?\s*([^\n]{5,80})",
-            r"位于([^\n]{5,60})",
-            r"在([^\n的]{3,40})[附近]",
-        ]
-        pos = text.find(poi_name)
-        search = text[pos:pos + 500] if pos != -1 else text[:500]
-
-        for pat in patterns:
-            m = re.search(pat, search)
-            if m:
-                return (m.group(1) if m.lastindex else m.group(0)).strip()
-        return None
+        # Scan a 500-char window from the POI name in place (no slice copy)
+        start = max(text.find(poi_name), 0)
+        m = _ADDRESS_RE.search(text, start, start + 500)
+        return m[m.lastgroup].strip() if m else None
 
     # ── Mock data (development / offline) ────────────────────────────────────
 
@@ -210,34 +338,31 @@ class SocialScraperTool:
         ],
     }
 
+    # Templates indexed by persona priority rank (see _TRIGGER_RANK)
+    _TEMPLATES_BY_RANK = tuple(map(_PERSONA_TEMPLATES.__getitem__, _PERSONA_PRIORITY))
+
+    @staticmethod
+    def _mock_pois(keyword: str, n: int) -> List[ScrapedPOI]:
+        # Memoised per (keyword, n); hand out copies so callers may mutate them
+        return [dict(p) for p in _mock_pois_cached(keyword, n)]
+
+    @staticmethod
+    def _mock_recent_posts(poi_name: str, n: int) -> List[Dict]:
+        return [dict(p) for p in _mock_recent_posts_cached(poi_name, n)]
+
     @staticmethod
-    def _mock_pois(keyword: str, n: int) -> List[Dict]:
+    def _build_mock_pois(keyword: str, n: int) -> List[ScrapedPOI]:
         # Detect persona from keyword suffixes before stripping them
-        persona = "chilling"  # default
-        if any(k in keyword for k in ["拍照", "摄影", "photography"]):
-            persona = "photography"
-        elif any(k in keyword for k in ["美食", "必吃", "小吃", "foodie"]):
-            persona = "foodie"
-        elif any(k in keyword for k in ["徒步", "户外", "运动", "exercise"]):
-            persona = "exercise"
-        elif any(k in keyword for k in ["咖啡", "休闲", "chill"]):
-            persona = "chilling"
+        rank = min(map(_TRIGGER_RANK.__getitem__, _PERSONA_TRIGGER_RE.findall(keyword)),
+                   default=_DEFAULT_RANK)
+        templates = SocialScraperTool._TEMPLATES_BY_RANK[rank]
 
         # Strip Chinese travel/persona suffixes to get clean destination name
-        dest = keyword
-        for suffix in ["旅游攻略", "攻略", "旅游", "景点推荐", "景点", "打卡",
-                       "美食推荐", "美食", "咖啡", "拍照打卡", "拍照", "摄影",
-                       "徒步", "户外运动", "休闲", "必吃", "特色小吃"]:
-            dest = dest.split(suffix)[0]
-        dest = dest.strip()
-
-        templates = SocialScraperTool._PERSONA_TEMPLATES.get(
-            persona, SocialScraperTool._PERSONA_TEMPLATES["chilling"]
-        )
+        dest = _SUFFIX_RE.split(keyword, maxsplit=1)[0].strip()
 
         return [
             {
-                "name":        tpl[0].format(dest=dest),
+                "name":        tpl[0].replace("{dest}", dest),
                 "address":     f"{dest}",
                 "raw_content": tpl[1],
                 "persona_score": tpl[2],
@@ -248,7 +373,7 @@ class SocialScraperTool:
         ]
 
     @staticmethod
-    def _mock_recent_posts(poi_name: str, n: int) -> List[Dict]:
+    def _build_mock_recent_posts(poi_name: str, n: int) -> List[Dict]:
         descriptions = [
             f"Just visited {poi_name} — still open and absolutely worth it! No renovation signs.",
             f"{poi_name} was great this weekend. Crowds are manageable on weekday mornings.",
@@ -263,3 +388,48 @@ class SocialScraperTool:
             }
             for i in range(min(3, n))
         ]
+
+
+def _iter_list_items(text: str) -> Iterator[str]:
+    """
+    Yield the text (3–60 chars, up to the line end) after each list bullet.
+
+    Most lines are prose, so a set lookup on the first character rejects
+    them before the bullet regex runs; the item is cut by plain slicing.
+    A bullet alone on its line ("1.", "①") takes the next non-blank line
+    as its item, unless that line is a bullet itself.
+    """
+    pending = False         # previous bullet line held no item text
+    for line in text.split("\n"):
+        is_bullet = bool(line) and (line[0] in _BULLET_CHARS or line[0].isdecimal())
+        if pending and not is_bullet:
+            item = line.lstrip(_ITEM_LEADING)
+            if not item:
+                continue            # blank line between bullet and item
+            pending = False
+            if len(item) >= 3:
+                yield item[:60]
+            continue
+        pending = False
+        if not is_bullet:
+            continue
+        m = _POI_BULLET_RE.match(line)
+        if m:
+            item = line[m.end():m.end() + 60]
+            if len(item) >= 3:
+                yield item
+            pending = not item
+        elif not line.isdecimal():
+            pending = _BARE_BULLET_RE.fullmatch(line) is not None
+
+
+@lru_cache(maxsize=256)
+def _mock_pois_cached(keyword: str, n: int) -> Tuple[ScrapedPOI, ...]:
+    """:meth:`SocialScraperTool._build_mock_pois` memoised (shared — copy before use)."""
+    return tuple(SocialScraperTool._build_mock_pois(keyword, n))
+
+
+@lru_cache(maxsize=256)
+def _mock_recent_posts_cached(poi_name: str, n: int) -> Tuple[Dict, ...]:
+    """:meth:`SocialScraperTool._build_mock_recent_posts` memoised (shared — copy before use)."""
+    return tuple(SocialScraperTool._build_mock_recent_posts(poi_name, n))
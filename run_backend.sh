@@ -19,7 +19,7 @@ mkdir -p outputs
 
 if [[ "$1" == "--prod" ]]; then
     echo "Starting Click2GO in PRODUCTION mode..."
-    uvicorn backend.main:app --host 0.0.0.0 --port 8000 --workers 2
+    uvicorn backend.main:app --host 0.0.0.0 --port 8000 --workers 2 --loop uvloop --http httptools
 else
     echo "Starting Click2GO in DEVELOPMENT mode (auto-reload)..."
     echo "API docs: http://127.0.0.1:8000/docs"
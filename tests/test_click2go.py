@@ -3,9 +3,11 @@ Click2GO – Test Suite
 =====================
 Run with:  python3 -m pytest tests/ -v
 """
+import asyncio
 import sys
 import os
 import json
+from types import SimpleNamespace
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
@@ -98,6 +100,78 @@ class TestPlanningAPI:
         assert body["status"] in ("pending", "scraping", "verifying",
                                    "routing", "exporting", "completed", "failed")
 
+    def test_status_reflects_committed_stage_immediately(self):
+        db = SessionLocal()
+        sid = "stat0000-0000-0000-0000-000000000000"
+        db.add(PlanningSession(id=sid, status=SessionStatus.SCRAPING))
+        db.commit()
+        assert client.get(f"/api/v1/plan/{sid}/status").json()["status"] == "scraping"
+
+        # e.g. committed by a pipeline running in another worker process
+        db.query(PlanningSession).filter(PlanningSession.id == sid).update({"status": SessionStatus.ROUTING})
+        db.commit()
+        db.close()
+        assert client.get(f"/api/v1/plan/{sid}/status").json()["status"] == "routing"
+
+    def test_pipeline_commits_no_intermediate_stages(self, monkeypatch):
+        from backend.routers import planning
+        stages = []
+        real_set_status = planning._set_status
+
+        def record(session_id, status):
+            stages.append(status)
+            return real_set_status(session_id, status)
+
+        monkeypatch.setattr(planning, "_set_status", record)
+        sid = client.post("/api/v1/plan", json=VALID_PLAN_PAYLOAD).json()["session_id"]
+        assert stages == [SessionStatus.SCRAPING]    # then only the final result
+        assert client.get(f"/api/v1/plan/{sid}/status").json()["status"] == "completed"
+
+    def test_background_pipeline_runs_on_event_loop(self, monkeypatch):
+        from backend.routers import planning
+        def no_sync_run(self, request):
+            raise AssertionError("pipeline should not block a threadpool worker via run()")
+        monkeypatch.setattr(TravelPlanningOrchestrator, "run", no_sync_run)
+
+        sid = client.post("/api/v1/plan", json=VALID_PLAN_PAYLOAD).json()["session_id"]
+        body = client.get(f"/api/v1/plan/{sid}/status").json()
+        assert body["status"] == "completed"
+        assert planning._pipeline_slots._value == planning.MAX_CONCURRENT_PIPELINES
+
+    def test_result_output_urls_cached_for_completed_sessions(self, monkeypatch):
+        from backend.routers import planning
+        sid = client.post("/api/v1/plan", json=VALID_PLAN_PAYLOAD).json()["session_id"]
+        first = client.get(f"/api/v1/plan/{sid}/result").json()
+        assert first["pdf_url"] == f"/outputs/itinerary_{sid[:8]}.pdf"
+
+        def no_stat(path):
+            raise AssertionError("completed session outputs should not be re-checked")
+        monkeypatch.setattr(planning.os.path, "isfile", no_stat)
+        again = client.get(f"/api/v1/plan/{sid}/result").json()
+        assert (again["pdf_url"], again["map_url"]) == (first["pdf_url"], first["map_url"])
+
+    def test_result_revalidates_with_etag(self):
+        sid = client.post("/api/v1/plan", json=VALID_PLAN_PAYLOAD).json()["session_id"]
+        first = client.get(f"/api/v1/plan/{sid}/result")
+        etag = first.headers["etag"]
+        assert "immutable" in first.headers["cache-control"]
+
+        again = client.get(f"/api/v1/plan/{sid}/result", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == etag
+
+    def test_session_short_ids_unique_within_the_same_second(self):
+        # exports, posters and the output-URL cache are keyed by session_id[:8]
+        from backend.database import SessionLocal
+        from backend.models import SessionStatus
+        from backend.routers import planning
+        from backend.schemas import PlanningRequest
+        req = PlanningRequest(**VALID_PLAN_PAYLOAD)
+        with SessionLocal() as db:
+            ids = [planning._create_session(req, db, SessionStatus.PENDING) for _ in range(3)]
+        assert len({sid[:8] for sid in ids}) == 3
+
     def test_status_unknown_session_returns_404(self):
         r = client.get("/api/v1/plan/00000000-0000-0000-0000-000000000000/status")
         assert r.status_code == 404
@@ -106,6 +180,120 @@ class TestPlanningAPI:
         r = client.get("/api/v1/plan/00000000-0000-0000-0000-000000000000/result")
         assert r.status_code == 404
 
+    def test_stream_disconnect_marks_failed_off_the_event_loop(self, monkeypatch):
+        import threading
+        from backend.routers import planning
+        from backend.schemas import PlanningRequest
+
+        async def stalled_run_stream(self, state):
+            await asyncio.sleep(3600)
+            yield {}
+        monkeypatch.setattr(TravelPlanningOrchestrator, "run_stream", stalled_run_stream)
+
+        threads = []
+        real_mark_failed = planning._mark_failed
+        def record(session_id, message):
+            threads.append(threading.current_thread())
+            real_mark_failed(session_id, message)
+        monkeypatch.setattr(planning, "_mark_failed", record)
+
+        with SessionLocal() as db:
+            sid = planning._create_session(PlanningRequest(**VALID_PLAN_PAYLOAD), db, SessionStatus.SCRAPING)
+
+        async def disconnect():
+            stream = planning._event_stream(sid, {})
+            await stream.__anext__()                      # "session" frame
+            task = asyncio.create_task(stream.__anext__())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        asyncio.run(disconnect())         # waits for the default executor on exit
+
+        assert threads and threads[0] is not threading.main_thread()
+        assert client.get(f"/api/v1/plan/{sid}/status").json()["status"] == "failed"
+
+    def test_stream_disconnect_on_first_frame_marks_failed(self):
+        from backend.routers import planning
+        from backend.schemas import PlanningRequest
+        with SessionLocal() as db:
+            sid = planning._create_session(PlanningRequest(**VALID_PLAN_PAYLOAD), db, SessionStatus.SCRAPING)
+
+        async def disconnect():
+            stream = planning._event_stream(sid, {})
+            await stream.__anext__()                      # "session" frame
+            await stream.aclose()
+        asyncio.run(disconnect())
+
+        assert client.get(f"/api/v1/plan/{sid}/status").json()["status"] == "failed"
+
+    def test_stream_disconnect_after_save_keeps_result(self):
+        from backend.routers import planning
+        from backend.schemas import PlanningRequest
+        with SessionLocal() as db:
+            sid = planning._create_session(PlanningRequest(**VALID_PLAN_PAYLOAD), db, SessionStatus.SCRAPING)
+        planning._save_result(sid, {"status": "completed", "clustered_days": [[{"name": "Senso-ji"}]]})
+
+        planning._mark_failed(sid, "Client disconnected before planning finished")
+        body = client.get(f"/api/v1/plan/{sid}/status").json()
+        assert body["status"] == "completed"
+        assert body["error_message"] is None
+
+    def test_stream_plan_emits_progress_then_done(self, monkeypatch):
+        # A key enables the per-POI fan-out; Claude itself is stubbed out
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-test-" + "x" * 20)
+        async def fake_verify(self, poi_name, recent_posts, persona, start_date, end_date):
+            return VerificationAgent._fallback(poi_name, reason="no_posts")
+        monkeypatch.setattr(VerificationAgent, "verify_async", fake_verify)
+
+        with client.stream("POST", "/api/v1/plan/stream", json=VALID_PLAN_PAYLOAD) as r:
+            assert r.status_code == 200
+            assert r.headers["content-type"].startswith("text/event-stream")
+            body = r.read().decode()
+
+        frames = []
+        for block in body.strip().split("\n\n"):
+            event, data = block.split("\n", 1)
+            frames.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+
+        events = [e for e, _ in frames]
+        assert events[0] == "session" and events[-1] == "done"
+        sid = frames[0][1]["session_id"]
+        verify_frames = [d for e, d in frames if e == "progress" and d["node"] == "verify_one"]
+        assert verify_frames and all(d["poi"]["name"] for d in verify_frames)
+        assert frames[-1][1]["status"] == "completed"
+
+        r2 = client.get(f"/api/v1/plan/{sid}/result")
+        assert r2.status_code == 200
+        assert r2.json()["stats"]["total_verified"] == len(verify_frames)
+
+    def test_persist_result_bulk_inserts_pois_and_days(self):
+        from backend.models import ItineraryDay
+        from backend.routers.planning import _persist_result
+
+        db = SessionLocal()
+        sid = "bulk0000-0000-0000-0000-000000000000"
+        session = PlanningSession(id=sid, status=SessionStatus.ROUTING)
+        db.add(session)
+        db.commit()
+        result = {
+            "status": "completed",
+            "clustered_days": [
+                [{"name": "A", "raw_content": "x" * 3000}, {"name": "B"}],
+                [{"name": "C", "recommendation": "INCLUDE"}],
+            ],
+            "stats": {"total_scraped": 5, "total_verified": 5, "total_included": 3},
+        }
+        _persist_result(db, session, result)
+
+        pois = db.query(POI).filter(POI.session_id == sid).order_by(POI.day_number, POI.stop_order).all()
+        assert [(p.name, p.day_number, p.stop_order) for p in pois] == [("A", 1, 1), ("B", 1, 2), ("C", 2, 1)]
+        assert len(pois[0].raw_content) == 2000 and pois[0].is_verified
+        days = db.query(ItineraryDay).filter(ItineraryDay.session_id == sid).order_by(ItineraryDay.day_number).all()
+        assert [d.poi_sequence for d in days] == [["A", "B"], ["C"]]
+        assert session.status == SessionStatus.COMPLETED and session.total_pois_included == 3
+        db.close()
+
     def test_result_while_in_progress_returns_202(self):
         r = client.post("/api/v1/plan", json=VALID_PLAN_PAYLOAD)
         sid = r.json()["session_id"]
@@ -193,6 +381,42 @@ class TestRouteOptimizer:
         days = self.opt.cluster_pois_by_day(TOKYO_POIS[:2], num_days=5)
         assert all(len(d) >= 1 for d in days)
 
+    def test_single_day_skips_clustering(self, monkeypatch):
+        from backend.services import route_optimizer
+        def no_clustering(*args, **kwargs):
+            raise AssertionError("a one-day trip needs no clustering")
+        monkeypatch.setattr(route_optimizer, "KMeans", no_clustering)
+        monkeypatch.setattr(RouteOptimizer, "_sweep_partition", no_clustering)
+        pois = [{"name": f"P{i}", "lat": 35.6 + i * 0.001, "lng": 139.7} for i in range(30)]
+        days = self.opt.cluster_pois_by_day(pois, num_days=1, max_per_day=5)
+        assert len(days) == 1 and len(days[0]) == 5
+
+    def test_pairwise_haversine_matches_scalar(self):
+        from backend.services.route_optimizer import pairwise_haversine_km
+        lats = [p["lat"] for p in TOKYO_POIS]
+        lngs = [p["lng"] for p in TOKYO_POIS]
+        dist = pairwise_haversine_km(lats, lngs)
+        assert dist.shape == (len(lats), len(lats))
+        for i in range(len(lats)):
+            for j in range(len(lats)):
+                assert dist[i, j] == pytest.approx(
+                    RouteOptimizer._haversine(lats[i], lngs[i], lats[j], lngs[j]), abs=1e-9)
+
+    def test_small_input_uses_sweep_partition(self, monkeypatch):
+        from backend.services import route_optimizer
+        def no_kmeans(*args, **kwargs):
+            raise AssertionError("K-Means should be skipped for small inputs")
+        monkeypatch.setattr(route_optimizer, "KMeans", no_kmeans)
+        days = self.opt.cluster_pois_by_day(TOKYO_POIS, num_days=2, max_per_day=3)
+        assert sorted(len(d) for d in days) == [3, 3]
+
+    def test_sweep_partition_splits_along_widest_axis(self):
+        import numpy as np
+        # Spread north–south: bands must follow latitude
+        coords = np.array([[35.0, 139.70], [35.9, 139.71], [35.1, 139.69], [35.8, 139.70]])
+        labels = RouteOptimizer._sweep_partition(coords, 2)
+        assert labels[0] == labels[2] and labels[1] == labels[3] and labels[0] != labels[1]
+
     def test_distribute_evenly_fallback(self):
         no_coords = [{"name": f"Place {i}", "persona_score": float(10 - i)}
                      for i in range(7)]
@@ -200,11 +424,93 @@ class TestRouteOptimizer:
         assert len(days) >= 2
         assert sum(len(d) for d in days) == 7
 
+    def test_distribute_evenly_orders_by_score_and_tolerates_missing(self):
+        pois = [{"name": "low", "persona_score": 2.0}, {"name": "none", "persona_score": None},
+                {"name": "high", "persona_score": 9.0}, {"name": "mid", "persona_score": 5.0}]
+        days = self.opt.distribute_evenly(pois, num_days=1, max_per_day=4)
+        assert [p["name"] for p in days[0]] == ["high", "mid", "low", "none"]
+
     def test_nearest_neighbour_keeps_all_pois(self):
         result = self.opt._nearest_neighbour(TOKYO_POIS)
         assert len(result) == len(TOKYO_POIS)
         assert {p["name"] for p in result} == {p["name"] for p in TOKYO_POIS}
 
+    def test_nearest_neighbour_selects_by_index_with_equal_pois(self):
+        # Equal dicts must stay distinct stops: selection is by position,
+        # not by an `==` scan as list.remove() would do
+        a, b = {"name": "Cafe", "lat": 35.66, "lng": 139.70}, {"name": "Cafe", "lat": 35.66, "lng": 139.70}
+        north = {"name": "North", "lat": 35.90, "lng": 139.70}
+        result = self.opt._nearest_neighbour([a, north, b])
+        assert result[0] is north
+        assert {id(p) for p in result} == {id(a), id(b), id(north)}
+
+    def test_nearest_neighbour_matches_greedy_reference(self):
+        import numpy as np
+        rng = np.random.default_rng(2)
+        pois = [{"name": f"P{i}", "lat": float(lat), "lng": float(lng)}
+                for i, (lat, lng) in enumerate(zip(rng.uniform(35.5, 35.8, 25), rng.uniform(139.5, 139.9, 25)))]
+
+        remaining = sorted(pois, key=lambda p: -p["lat"])
+        expected  = [remaining.pop(0)]
+        while remaining:
+            cur = expected[-1]
+            nxt = min(remaining, key=lambda p: RouteOptimizer._haversine(cur["lat"], cur["lng"], p["lat"], p["lng"]))
+            expected.append(nxt)
+            remaining.remove(nxt)
+
+        assert [p["name"] for p in self.opt._nearest_neighbour(pois)] == [p["name"] for p in expected]
+
+    def test_haversine_assign_matches_brute_force(self):
+        import numpy as np
+        from backend.services.route_optimizer import _haversine_assign_np
+        rng = np.random.default_rng(0)
+        pts = np.column_stack((rng.uniform(35.5, 35.8, 40), rng.uniform(139.5, 139.9, 40)))
+        ctr = pts[:3]
+        labels = _haversine_assign_np(np.radians(pts), np.radians(ctr))
+        for (lat, lng), label in zip(pts, labels):
+            dists = [RouteOptimizer._haversine(lat, lng, c_lat, c_lng) for c_lat, c_lng in ctr]
+            assert label == int(np.argmin(dists))
+
+    def test_haversine_key_ranks_like_distance(self):
+        import math
+        from backend.services.route_optimizer import _haversine_key
+        origin = (35.68, 139.69)
+        others = [(35.66, 139.70), (34.69, 135.50), (35.71, 139.80), (43.06, 141.35)]
+
+        def key(lat, lng):
+            return _haversine_key(math.radians(lat - origin[0]), math.radians(lng - origin[1]),
+                                  math.cos(math.radians(origin[0])), math.cos(math.radians(lat)))
+
+        by_key  = sorted(others, key=lambda p: key(*p))
+        by_dist = sorted(others, key=lambda p: RouteOptimizer._haversine(*origin, *p))
+        assert by_key == by_dist
+
+    def test_large_input_uses_haversine_assignment(self):
+        import numpy as np
+        rng = np.random.default_rng(1)
+        pois = [{"name": f"P{i}", "lat": float(lat), "lng": float(lng)}
+                for i, (lat, lng) in enumerate(zip(rng.uniform(35.5, 35.8, 40), rng.uniform(139.5, 139.9, 40)))]
+        days = self.opt.cluster_pois_by_day(pois, num_days=4, max_per_day=20)
+        assert sum(len(d) for d in days) == len(pois)
+
+    def test_pipeline_sized_input_uses_haversine_assignment(self, monkeypatch):
+        # 20 candidates is the most _scrape_pois passes on
+        import numpy as np
+        from backend.services import route_optimizer
+        calls = []
+        real_assign = route_optimizer._haversine_assign_np
+        def record(coords, centers):
+            calls.append(len(coords))
+            return real_assign(coords, centers)
+        monkeypatch.setattr(route_optimizer, "_haversine_assign_np", record)
+
+        rng = np.random.default_rng(2)
+        pois = [{"name": f"P{i}", "lat": float(lat), "lng": float(lng)}
+                for i, (lat, lng) in enumerate(zip(rng.uniform(35.5, 35.8, 20), rng.uniform(139.5, 139.9, 20)))]
+        days = self.opt.cluster_pois_by_day(pois, num_days=3, max_per_day=20)
+        assert calls == [20]
+        assert sum(len(d) for d in days) == len(pois)
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 5. Map Tool
@@ -241,6 +547,55 @@ class TestMapTool:
         assert isinstance(lat, float)
         assert isinstance(lng, float)
 
+    def test_mock_geocode_matches_multiword_city_case_insensitively(self):
+        lat, lng = MapTool._mock_geocode("Victoria Peak, HONG KONG")
+        assert 22.0 < lat < 22.6 and 113.9 < lng < 114.4
+        # Multi-word city names win over a later single-word region
+        lat, lng = MapTool._mock_geocode("Los Angeles, California")
+        assert 34.0 < lat < 34.1 and -118.3 < lng < -118.2
+
+    def test_geocode_memoised_per_normalised_address(self, monkeypatch):
+        from backend.tools import map_tool
+        map_tool._mock_geocode_cached.cache_clear()
+        calls = []
+        real = MapTool._mock_geocode
+        monkeypatch.setattr(MapTool, "_mock_geocode",
+                            staticmethod(lambda a: calls.append(a) or real(a)))
+        first = self.mt.geocode("Senso-ji  Asakusa Tokyo")
+        assert self.mt.geocode("senso-ji asakusa TOKYO") == first
+        assert asyncio.run(self.mt.geocode_batch(["Senso-ji Asakusa Tokyo"])) == [first]
+        assert len(calls) == 1
+        map_tool._mock_geocode_cached.cache_clear()
+
+    def test_live_geocode_cache_is_bounded(self, monkeypatch):
+        from backend.tools import map_tool
+        monkeypatch.setattr(map_tool, "_geocode_cache", map_tool._LRUCache(maxsize=2))
+        monkeypatch.setattr(map_tool.settings, "google_maps_api_key", "test-key")
+        monkeypatch.setattr(map_tool, "get_http_client", lambda: None)
+
+        async def fake_google(self, client, address):
+            return (float(len(address)), 0.0)
+        monkeypatch.setattr(MapTool, "_google_geocode", fake_google)
+
+        addresses = ["a", "bb", "ccc"]
+        coords = asyncio.run(self.mt.geocode_batch(addresses))
+        assert coords == [(1.0, 0.0), (2.0, 0.0), (3.0, 0.0)]   # batch larger than the cache
+        assert len(map_tool._geocode_cache) == 2
+        assert map_tool._geocode_cache.get("a") is None          # least recently used evicted
+
+    def test_mock_geocode_is_deterministic_per_address(self):
+        a = MapTool._mock_geocode("Shibuya Crossing Tokyo")
+        assert MapTool._mock_geocode("Shibuya Crossing Tokyo") == a
+        assert MapTool._mock_geocode("Tokyo Tower, Tokyo") != a
+        assert abs(a[0] - 35.6762) <= 0.015 and abs(a[1] - 139.6503) <= 0.015
+
+    def test_geocode_batch_preserves_order(self):
+        coords = asyncio.run(self.mt.geocode_batch(["Tokyo", "Beijing 北京", "XYZ_UNKNOWN"]))
+        assert len(coords) == 3
+        assert 35.0 < coords[0][0] < 36.5
+        assert 39.0 < coords[1][0] < 41.0
+        assert coords[2] is None
+
     def test_haversine_same_point_is_zero(self):
         d = self.mt._haversine(35.0, 139.0, 35.0, 139.0)
         assert d == pytest.approx(0.0)
@@ -277,6 +632,7 @@ class TestMapTool:
 # ══════════════════════════════════════════════════════════════════════════════
 
 from backend.agents.verification_agent import VerificationAgent
+from backend.config import settings
 
 
 class TestVerificationAgent:
@@ -306,6 +662,48 @@ class TestVerificationAgent:
                                    "2026-04-01", "2026-04-03")
         assert 0.0 <= result["persona_score"] <= 10.0
 
+    def test_verify_async_matches_sync_fallback(self):
+        args = ("Harajuku", [], "exercise", "2026-04-01", "2026-04-03")
+        result = asyncio.run(self.agent.verify_async(*args))
+        assert result == self.agent.verify(*args)
+
+    def test_parse_response_strips_markdown_fences(self):
+        for text in ('```json\n{"recommendation": "EXCLUDE"}\n```',
+                     '```\n{"recommendation": "EXCLUDE"}```  ',
+                     '```json {"recommendation": "EXCLUDE"}',
+                     '{"recommendation": "EXCLUDE"}'):
+            message = SimpleNamespace(content=[SimpleNamespace(text=text)])
+            assert self.agent._parse_response(message) == {"recommendation": "EXCLUDE"}
+
+    def test_repeat_verification_served_from_cache(self, monkeypatch):
+        calls = []
+
+        class FakeStream:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def get_final_message(self):
+                text = '{"recommendation": "EXCLUDE", "persona_score": 3.0}'
+                return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=None)
+
+        def stream(**kwargs):
+            calls.append(kwargs)
+            return FakeStream()
+
+        fake_client = SimpleNamespace(messages=SimpleNamespace(stream=stream))
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-test-" + "x" * 20)
+        monkeypatch.setattr(self.agent, "_get_client", lambda: fake_client)
+
+        args = ("Cache Test Café", ["Open as usual."], "chilling", "2026-04-01", "2026-04-03")
+        first  = self.agent.verify(*args)
+        second = self.agent.verify(*args)
+        assert first == second == {"recommendation": "EXCLUDE", "persona_score": 3.0}
+        assert len(calls) == 1
+        assert self.agent.cache_hits == 1
+
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 7. Itinerary Exporter
@@ -348,6 +746,23 @@ class TestItineraryExporter:
         assert os.path.exists(path)
         assert path.endswith(".pdf") or path.endswith(".txt")
 
+    def test_atomic_write_uses_private_temp_files(self, tmp_path, monkeypatch):
+        from concurrent.futures import ThreadPoolExecutor
+        from backend.tools import itinerary_exporter
+        target = str(tmp_path / "map_x.html")
+        payloads = [bytes([65 + i]) * 200_000 for i in range(8)]
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda data: itinerary_exporter._write_atomic(target, data), payloads))
+        with open(target, "rb") as fh:
+            assert fh.read() in payloads            # one whole write, never a mix
+
+        def broken_replace(src, dst):
+            raise OSError("disk full")
+        monkeypatch.setattr(itinerary_exporter.os, "replace", broken_replace)
+        with pytest.raises(OSError):
+            itinerary_exporter._write_atomic(target, b"x")
+        assert os.listdir(tmp_path) == ["map_x.html"]
+
     def test_map_file_is_created(self):
         path = self.exp.generate_route_map(MOCK_ITINERARY, MOCK_PROFILE)
         assert os.path.exists(path)
@@ -369,6 +784,26 @@ class TestItineraryExporter:
             assert "Shibuya Crossing" in content
             assert "TeamLab Borderless" in content
 
+    def test_map_markers_emitted_as_one_escaped_data_block(self):
+        stop = {"name": "Bar </script> Tokyo", "lat": 35.66, "lng": 139.70}
+        itinerary = {**MOCK_ITINERARY, "session_id": "mapjs000-0000-0000-0000-000000000000",
+                     "days": [[stop, {**stop, "name": "Next", "lat": 35.67}]]}
+        path = self.exp.generate_route_map(itinerary, MOCK_PROFILE)
+        if path.endswith(".html"):
+            content = open(path).read()
+            assert content.count("data.stops.forEach") == 1
+            assert "Bar <\\/script> Tokyo" in content
+
+    def test_zero_coordinates_are_kept(self):
+        # Null Island-adjacent stops (lat or lng == 0.0) are real coordinates
+        itinerary = {"session_id": "zerogeo0-0000-0000-0000-000000000000",
+                     "days": [[{"name": "Greenwich", "lat": 51.4779, "lng": 0.0},
+                               {"name": "Quito", "lat": 0.0, "lng": -78.4678}]]}
+        path = self.exp._geojson_fallback(itinerary)
+        with open(path) as f:
+            assert len(json.load(f)["features"]) == 2
+        assert MapTool().calculate_distance(*itinerary["days"][0]) > 0
+
     def test_geojson_fallback_structure(self):
         itinerary = {**MOCK_ITINERARY, "session_id": "geojson0-0000-0000-0000-000000000000"}
         path = self.exp._geojson_fallback(itinerary)
@@ -383,6 +818,7 @@ class TestItineraryExporter:
 # 8. Social Scraper Tool (offline / mock mode)
 # ══════════════════════════════════════════════════════════════════════════════
 
+from backend.tools import social_scraper_tool
 from backend.tools.social_scraper_tool import SocialScraperTool
 
 
@@ -402,6 +838,26 @@ class TestSocialScraperTool:
             assert "name" in poi
             assert "likes" in poi
 
+    def test_mock_pois_strip_keyword_suffixes(self):
+        for keyword in ("成都美食推荐", "成都拍照打卡", "成都旅游攻略", "成都"):
+            pois = self.scraper._mock_pois(keyword, 1)
+            assert pois[0]["address"] == "成都"
+
+    def test_mock_pois_persona_priority(self):
+        # photography > foodie > exercise > chilling, regardless of position
+        assert "Golden Hour" in self.scraper._mock_pois("成都徒步拍照", 1)[0]["name"]
+        assert "Wet Market" in self.scraper._mock_pois("成都咖啡美食", 1)[0]["name"]
+        assert "Riverside" in self.scraper._mock_pois("成都", 1)[0]["name"]
+
+    def test_mock_pois_memoised_but_returned_as_copies(self):
+        social_scraper_tool._mock_pois_cached.cache_clear()
+        first = self.scraper._mock_pois("Kyoto Coffee", 3)
+        first[0]["lat"] = 35.0
+        second = self.scraper._mock_pois("Kyoto Coffee", 3)
+        assert social_scraper_tool._mock_pois_cached.cache_info().hits == 1
+        assert "lat" not in second[0]
+        assert second[0] is not first[0]
+
     def test_mock_recent_posts_returns_list(self):
         posts = self.scraper._mock_recent_posts("Shibuya Crossing", 3)
         assert len(posts) == 3
@@ -418,6 +874,30 @@ class TestSocialScraperTool:
         names = [p["name"] for p in pois]
         assert any("Shibuya" in n or "Harajuku" in n or "Shinjuku" in n for n in names)
 
+    def test_extract_pois_caps_item_text_at_line_and_60_chars(self):
+        note = {"title": "Kyoto", "content": "① " + "Fushimi Inari " * 10 + "\n📍 Nishiki Market\n2.、ab"}
+        names = [p["name"] for p in self.scraper._extract_pois_from_note(note)]
+        assert names == [("Fushimi Inari " * 10)[:60].strip(), "Nishiki Market"]
+
+    def test_extract_pois_trims_trailing_punctuation_and_spaces(self):
+        note = {"title": "Kyoto", "content": "1. Nishiki Market ：\n2.\u3000Kiyomizu-dera。\u3000"}
+        names = [p["name"] for p in self.scraper._extract_pois_from_note(note)]
+        assert names == ["Nishiki Market", "Kiyomizu-dera"]
+
+    def test_extract_pois_bullets_only_at_line_start(self):
+        # a bare year line must not swallow the next line as a list item
+        note = {"title": "Osaka", "content": "2024\nGreat trip, see 3. below\n１. Dotonbori"}
+        names = [p["name"] for p in self.scraper._extract_pois_from_note(note)]
+        assert names == ["Dotonbori"]
+
+    def test_extract_pois_bullet_on_its_own_line(self):
+        for content, expected in (("1.\n一兰拉面总店", "一兰拉面总店"),
+                                  ("①\n浅草寺雷门", "浅草寺雷门"),
+                                  ("📍\n\nShibuya Sky\n2. Miyashita Park", "Shibuya Sky")):
+            note = {"title": "Tokyo", "content": content}
+            names = [p["name"] for p in self.scraper._extract_pois_from_note(note)]
+            assert names[0] == expected
+
     def test_extract_pois_fallback_to_title(self):
         note = {"title": "Best Ramen in Tokyo", "content": "Long prose with no list.", "likes": 50}
         pois = self.scraper._extract_pois_from_note(note)
@@ -430,7 +910,452 @@ class TestSocialScraperTool:
         assert addr is not None
         assert "106" in addr
 
+    def test_extract_address_returns_labelled_group(self):
+        text = "Ichiran Ramen 地址：東京都渋谷区神南1-22-7\n营业时间 24h"
+        addr = self.scraper._extract_address(text, "Ichiran Ramen")
+        assert addr == "東京都渋谷区神南1-22-7"
+
+    def test_extract_address_none_without_cue(self):
+        assert self.scraper._extract_address("Just a quiet park", "park") is None
+
+    def test_recent_posts_async_fetches_notes_concurrently(self):
+        import threading
+
+        class FakeAPI:
+            def __init__(self):
+                self.barrier = threading.Barrier(3, timeout=2)
+
+            def search(self, keyword, max_results=20):
+                return [{"id": f"n{i}", "xsecToken": "t", "liked_count": i} for i in range(3)]
+
+            def get_note_content(self, feed_id, xsec_token):
+                self.barrier.wait()     # only passes if all three are in flight
+                return {"title": feed_id, "content": "still open"}
+
+        self.scraper._api = FakeAPI()
+        self.scraper._login_ok, self.scraper._login_expires_at = True, float("inf")
+        posts = asyncio.run(self.scraper.get_recent_posts_async("Senso-ji", 3))
+        assert [p["id"] for p in posts] == ["n0", "n1", "n2"]
+        assert posts[2]["likes"] == 2
+
+    def test_recent_posts_async_bounds_concurrent_fetches(self):
+        import threading
+        import time
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        class FakeAPI:
+            def search(self, keyword, max_results=20):
+                return [{"id": f"n{i}", "xsecToken": "t"} for i in range(8)]
+
+            def get_note_content(self, feed_id, xsec_token):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+                return {"title": feed_id, "content": ""}
+
+        self.scraper._api = FakeAPI()
+        self.scraper._login_ok, self.scraper._login_expires_at = True, float("inf")
+        posts = asyncio.run(self.scraper.get_recent_posts_async("Senso-ji", 8))
+        assert len(posts) == 8
+        assert 1 < peak[0] <= SocialScraperTool._NOTE_FETCH_LIMIT
+
+    def test_recent_posts_async_limit_shared_across_concurrent_calls(self):
+        import threading
+        import time
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        class FakeAPI:
+            def search(self, keyword, max_results=20):
+                return [{"id": f"{keyword}{i}", "xsecToken": "t"} for i in range(3)]
+
+            def get_note_content(self, feed_id, xsec_token):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+                return {"title": feed_id, "content": ""}
+
+        self.scraper._api = FakeAPI()
+        self.scraper._login_ok, self.scraper._login_expires_at = True, float("inf")
+
+        async def verify_many():
+            # as verify_one does for VERIFY_CONCURRENCY POIs at once
+            return await asyncio.gather(*(
+                self.scraper.get_recent_posts_async(f"poi{i}", 3) for i in range(8)
+            ))
+        results = asyncio.run(verify_many())
+        assert all(len(posts) == 3 for posts in results)
+        assert peak[0] <= SocialScraperTool._NOTE_FETCH_LIMIT
+
+        # A second loop (sync run() wrapper) gets its own semaphore
+        assert len(asyncio.run(self.scraper.get_recent_posts_async("again", 3))) == 3
+
+    def test_login_check_cached_until_ttl_expires(self, monkeypatch):
+        calls = []
+
+        class FakeAPI:
+            def check_login(self):
+                calls.append(1)
+                return True
+
+        clock = [1000.0]
+        monkeypatch.setattr(social_scraper_tool.time, "monotonic", lambda: clock[0])
+        self.scraper._api = FakeAPI()
+        assert self.scraper._ensure_login() and self.scraper._ensure_login()
+        assert len(calls) == 1
+        clock[0] += SocialScraperTool._LOGIN_TTL_S + 1
+        assert self.scraper._ensure_login()
+        assert len(calls) == 2
+
+    def test_search_pois_stops_fetching_once_satisfied(self, monkeypatch):
+        read = []
+
+        class FakeAPI:
+            def search(self, keyword, max_results=20):
+                return [{"id": i, "xsecToken": "t"} for i in range(10)]
+
+            def get_note_content(self, feed_id, xsec_token):
+                read.append(feed_id)
+                return {"title": f"Note {feed_id}", "content": "1. Shibuya Sky\n2. Miyashita Park"}
+
+        monkeypatch.setattr(SocialScraperTool, "_NOTE_FETCH_DELAY_S", 0)
+        self.scraper._api = FakeAPI()
+        self.scraper._login_ok, self.scraper._login_expires_at = True, float("inf")
+        pois = self.scraper.search_pois("Tokyo", max_results=3)
+        assert [p["name"] for p in pois] == ["Shibuya Sky", "Miyashita Park", "Shibuya Sky"]
+        assert read == [0, 1]
+
     def test_search_pois_returns_list_when_offline(self):
         # MCP server not running → falls back to mock data
         pois = self.scraper.search_pois("Tokyo Coffee", max_results=5)
         assert isinstance(pois, list)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 9. Orchestrator (offline / mock mode)
+# ══════════════════════════════════════════════════════════════════════════════
+
+from backend.agents.orchestrator import TravelPlanningOrchestrator
+
+
+class TestOrchestrator:
+
+    def setup_method(self):
+        self.orch = TravelPlanningOrchestrator()
+
+    def _state(self, raw_pois):
+        return {
+            "raw_pois":   raw_pois,
+            "personas":   ["photography"],
+            **TravelPlanningOrchestrator._persona_fields(["photography"]),
+            "start_date": "2026-04-01",
+            "end_date":   "2026-04-03",
+            "stats":      {},
+        }
+
+    @pytest.fixture
+    def with_key(self, monkeypatch):
+        """Configure a key so the fan-out runs; Claude itself is stubbed out."""
+        monkeypatch.setattr(settings, "anthropic_api_key", "sk-test-" + "x" * 20)
+        async def fake_verify(poi_name, recent_posts, persona, start_date, end_date):
+            return VerificationAgent._fallback(poi_name, reason="no_posts")
+        monkeypatch.setattr(self.orch.verifier, "verify_async", fake_verify)
+
+    def _verify_all(self, raw_pois, order=None):
+        """Run the fan-out tasks (in the given completion order) and the merge step."""
+        state = self._state(raw_pois)
+        tasks = self.orch._fan_out_verification(state)
+        results = []
+        for send in (order(tasks) if order else tasks):
+            out = asyncio.run(self.orch._verify_single_poi(send.arg))
+            results += out["verification_results"]
+        return asyncio.run(self.orch._verify_pois({**state, "verification_results": results}))
+
+    def test_fan_out_sends_one_task_per_poi(self, with_key):
+        raw = [{"name": p["name"]} for p in TOKYO_POIS]
+        tasks = self.orch._fan_out_verification(self._state(raw))
+        assert [t.node for t in tasks] == ["verify_one"] * len(raw)
+        assert [t.arg["index"] for t in tasks] == list(range(len(raw)))
+        assert tasks[0].arg["persona"] == "photography"
+
+    def test_persona_fields_precomputed(self):
+        fields = TravelPlanningOrchestrator._persona_fields(["photography", "foodie", "unknown"])
+        assert fields["persona_label"] == "photography & foodie & unknown"
+        assert fields["persona_display"] == "Photography & Foodie & Unknown"
+        assert fields["persona_keywords"] == ["拍照打卡", "美食推荐"]
+
+    def test_fan_out_without_pois_skips_to_merge(self, with_key):
+        assert self.orch._fan_out_verification(self._state([])) == "verify_pois"
+
+    def test_without_api_key_skips_fan_out_and_post_fetches(self, monkeypatch):
+        monkeypatch.setattr(settings, "anthropic_api_key", "")
+        async def no_posts(*args, **kwargs):
+            raise AssertionError("posts should not be fetched without an API key")
+        monkeypatch.setattr(self.orch.scraper, "get_recent_posts_async", no_posts)
+
+        raw = [{"name": "Shibuya Crossing", "address": "Shibuya, Tokyo"}, {"name": "Harajuku"}]
+        state = self._state(raw)
+        assert self.orch._fan_out_verification(state) == "verify_pois"
+        out = asyncio.run(self.orch._verify_pois(state))
+        assert [p["name"] for p in out["verified_pois"]] == ["Shibuya Crossing", "Harajuku"]
+        assert all(p["recommendation"] == "INCLUDE" for p in out["verified_pois"])
+        assert 35.0 < out["verified_pois"][0]["lat"] < 36.5
+
+    def test_verify_pois_keeps_order_and_count(self, with_key):
+        raw = [{"name": p["name"], "address": "Tokyo"} for p in TOKYO_POIS]
+        out = self._verify_all(raw, order=lambda tasks: list(reversed(tasks)))
+        assert [p["name"] for p in out["verified_pois"]] == [p["name"] for p in TOKYO_POIS]
+        assert out["stats"]["total_verified"] == len(TOKYO_POIS)
+
+    def test_verify_pois_geocodes_addresses(self, with_key):
+        raw = [{"name": "Shibuya Crossing", "address": "Shibuya, Tokyo"}]
+        poi = self._verify_all(raw)["verified_pois"][0]
+        assert 35.0 < poi["lat"] < 36.5
+        assert 138.0 < poi["lng"] < 141.0
+
+    def test_verify_single_poi_failure_falls_back(self, with_key, monkeypatch):
+        async def boom(*args, **kwargs):
+            raise RuntimeError("scraper down")
+        monkeypatch.setattr(self.orch.scraper, "get_recent_posts_async", boom)
+        poi = self._verify_all([{"name": "Harajuku"}])["verified_pois"][0]
+        assert poi["name"] == "Harajuku"
+        assert "scraper down" in poi["agent_note"] + poi["reasoning"]
+
+    def test_retry_scrape_resets_fan_out_results(self, monkeypatch):
+        monkeypatch.setattr(self.orch.scraper, "search_pois",
+                            lambda keyword, max_results=20: [{"name": "Harajuku"}])
+        state = {"destination": "Tokyo", "stats": {},
+                 **TravelPlanningOrchestrator._persona_fields(["foodie"]), "scrape_attempts": 1}
+        out = asyncio.run(self.orch._scrape_pois(state))
+        assert out["verification_results"] is None
+        from backend.agents.orchestrator import _collect_results
+        assert _collect_results([{"index": 0}], None) == []
+        assert _collect_results([{"index": 0}], [{"index": 1}]) == [{"index": 0}, {"index": 1}]
+
+    def test_graph_verifies_every_scraped_poi(self):
+        state = self.orch.run({
+            "destination": "Tokyo", "start_date": "2026-04-01", "end_date": "2026-04-02",
+            "personas": ["photography"],
+        })
+        assert state["status"] == "completed"
+        assert state["stats"]["total_verified"] == state["stats"]["total_scraped"]
+
+    def test_scrape_pois_drops_near_duplicate_names(self, monkeypatch):
+        found = [{"name": "Shibuya Crossing"}, {"name": "shibuya  crossing!"}, {"name": "Harajuku"}]
+        monkeypatch.setattr(self.orch.scraper, "search_pois",
+                            lambda keyword, max_results=20: [dict(p) for p in found])
+        state = {"destination": "Tokyo", "stats": {},
+                 **TravelPlanningOrchestrator._persona_fields(["foodie"])}
+        out = asyncio.run(self.orch._scrape_pois(state))
+        assert [p["name"] for p in out["raw_pois"]] == ["Shibuya Crossing", "Harajuku"]
+
+    def test_filter_pois_splits_included_and_rejected(self):
+        verified = [
+            {"name": "A", "recommendation": "INCLUDE", "is_open": True,  "persona_score": 6.0},
+            {"name": "B", "recommendation": "EXCLUDE", "is_open": True,  "persona_score": 9.0},
+            {"name": "C", "recommendation": "INCLUDE", "is_open": False, "persona_score": 8.0},
+            {"name": "D", "recommendation": "INCLUDE", "is_open": None,  "persona_score": 7.0},
+        ]
+        out = self.orch._filter_pois({"verified_pois": verified, "stats": {}})
+        assert [p["name"] for p in out["verified_pois"]] == ["D", "A"]
+        assert [p["name"] for p in out["rejected_pois"]] == ["B", "C"]
+
+    def test_filter_pois_keeps_only_top_scoring(self):
+        verified = [{"name": f"P{i}", "recommendation": "INCLUDE", "persona_score": float(i % 10)}
+                    for i in range(30)]
+        state = {"verified_pois": verified, "days_total": 2, "max_pois_per_day": 3, "stats": {}}
+        out = self.orch._filter_pois(state)
+        kept = out["verified_pois"]
+        assert len(kept) == 2 * 3 + 4
+        assert [p["persona_score"] for p in kept] == sorted((p["persona_score"] for p in verified),
+                                                            reverse=True)[:10]
+        assert out["stats"]["total_included"] == 30
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 10. Image Router
+# ══════════════════════════════════════════════════════════════════════════════
+
+import httpx
+
+from backend.routers import image as image_router
+
+
+class TestImageAPI:
+
+    def test_generate_image_unknown_session_returns_404(self):
+        r = client.post("/api/v1/plan/00000000-0000-0000-0000-000000000000/generate-image",
+                        json={"language": "en"})
+        assert r.status_code == 404
+
+    def test_generate_image_rejects_unknown_fields(self):
+        r = client.post("/api/v1/plan/00000000-0000-0000-0000-000000000000/generate-image",
+                        json={"language": "en", "style": "anime"})
+        assert r.status_code == 422
+
+    def test_poster_url_is_stable_across_processes(self):
+        import subprocess
+        import sys
+        from backend.tools.image_generator import generate_travel_poster
+        itinerary = {"destination": "Tokyo", "personas": ["foodie"],
+                     "days": [{"day_number": 1, "pois": ["Tsukiji"]}]}
+        code = ("import json, sys; from backend.tools.image_generator import generate_travel_poster;"
+                "print(generate_travel_poster('en', json.loads(sys.argv[1]))['image_url'])")
+        other = subprocess.run(
+            [sys.executable, "-c", code, json.dumps(itinerary)],
+            capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": "12345"},
+        ).stdout.strip()
+        assert generate_travel_poster("en", itinerary)["image_url"] == other
+
+    def test_download_streams_poster_to_disk(self, tmp_path, monkeypatch):
+        payload = b"\xff\xd8" + b"x" * 200_000
+        transport = httpx.MockTransport(lambda req: httpx.Response(200, content=payload))
+        monkeypatch.setattr(image_router, "get_http_client",
+                            lambda: httpx.AsyncClient(transport=transport))
+
+        dest = tmp_path / "poster.jpg"
+        asyncio.run(image_router._download_to("https://image.example/poster", str(dest)))
+        assert dest.read_bytes() == payload
+        assert os.listdir(tmp_path) == ["poster.jpg"]        # no temp file left behind
+
+    def test_failed_download_leaves_no_temp_file(self, tmp_path, monkeypatch):
+        class BrokenStream(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                yield b"\xff\xd8" + b"x" * 1000
+                raise httpx.ReadError("connection reset")
+
+        transport = httpx.MockTransport(lambda req: httpx.Response(200, stream=BrokenStream()))
+        monkeypatch.setattr(image_router, "get_http_client",
+                            lambda: httpx.AsyncClient(transport=transport))
+
+        dest = tmp_path / "poster.jpg"
+        with pytest.raises(httpx.ReadError):
+            asyncio.run(image_router._download_to("https://image.example/poster", str(dest)))
+        assert os.listdir(tmp_path) == []
+
+    def _make_session(self, status):
+        db = SessionLocal()
+        profile = UserProfile(destination="Kyoto", persona="photography,foodie")
+        db.add(profile)
+        db.flush()
+        sid = "img00000-0000-0000-0000-000000000000"
+        db.add(PlanningSession(id=sid, user_profile_id=profile.id, status=status))
+        db.add_all([
+            POI(session_id=sid, name="Fushimi Inari", day_number=1, stop_order=2),
+            POI(session_id=sid, name="Kiyomizu-dera", day_number=1, stop_order=1),
+            POI(session_id=sid, name="Nishiki Market", day_number=2, stop_order=1),
+        ])
+        db.commit()
+        db.close()
+        return sid
+
+    def test_generate_image_incomplete_session_returns_400(self):
+        sid = self._make_session(SessionStatus.ROUTING)
+        r = client.post(f"/api/v1/plan/{sid}/generate-image", json={"language": "en"})
+        assert r.status_code == 400
+
+    def test_generate_image_prompt_follows_itinerary_order(self, monkeypatch):
+        async def fake_download(url, save_path, headers=None):
+            return None
+        monkeypatch.setattr(image_router, "_download_to", fake_download)
+
+        sid = self._make_session(SessionStatus.COMPLETED)
+        r = client.post(f"/api/v1/plan/{sid}/generate-image", json={"language": "en"})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["success"] is True
+        prompt = body["prompt_used"]
+        assert "Kyoto" in prompt and "Photography & Foodie" in prompt
+        assert prompt.index("Kiyomizu-dera") < prompt.index("Fushimi Inari") < prompt.index("Nishiki Market")
+
+    def test_generate_image_returns_direct_url_and_caches_in_background(self, monkeypatch):
+        downloads = []
+        async def fake_download(url, save_path, headers=None):
+            downloads.append((url, save_path))
+        monkeypatch.setattr(image_router, "_download_to", fake_download)
+
+        sid = self._make_session(SessionStatus.COMPLETED)
+        body = client.post(f"/api/v1/plan/{sid}/generate-image", json={"language": "zh"}).json()
+        assert body["image_url"].startswith("https://image.pollinations.ai/")
+        assert downloads == [(body["image_url"], os.path.join("outputs", f"poster_{sid[:8]}_zh.jpg"))]
+
+    def test_generate_image_serves_cached_poster_and_revalidates(self, monkeypatch):
+        payload = b"\xff\xd8poster"
+        seen = []
+        def handler(req):
+            seen.append(req.headers.get("if-none-match"))
+            if req.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=payload, headers={"ETag": '"v1"'})
+        transport = httpx.MockTransport(handler)
+        monkeypatch.setattr(image_router, "get_http_client",
+                            lambda: httpx.AsyncClient(transport=transport))
+
+        sid  = self._make_session(SessionStatus.COMPLETED)
+        path = os.path.join("outputs", f"poster_{sid[:8]}_en.jpg")
+        url  = f"/api/v1/plan/{sid}/generate-image"
+        try:
+            first = client.post(url, json={"language": "en"}).json()
+            assert first["image_url"].startswith("https://image.pollinations.ai/")
+            assert open(path, "rb").read() == payload
+
+            # Fresh copy: served locally, nothing fetched
+            second = client.post(url, json={"language": "en"}).json()
+            assert second["image_url"] == f"/outputs/poster_{sid[:8]}_en.jpg"
+            assert seen == [None]
+
+            # Stale copy: still served locally, revalidated with the stored ETag
+            meta = image_router._read_meta(path)
+            image_router._write_meta(path, {**meta, "fetched_at": 0})
+            third = client.post(url, json={"language": "en"}).json()
+            assert third["image_url"] == second["image_url"]
+            assert seen == [None, '"v1"']
+            assert open(path, "rb").read() == payload
+            assert image_router._read_meta(path)["fetched_at"] > 0
+        finally:
+            for p in (path, f"{path}.json"):
+                if os.path.exists(p):
+                    os.remove(p)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 11. Shared HTTP clients
+# ══════════════════════════════════════════════════════════════════════════════
+
+from backend import clients
+
+
+class TestSharedClients:
+
+    def test_http_client_reused_within_loop(self):
+        async def scenario():
+            first = clients.get_http_client()
+            assert clients.get_http_client() is first
+            await clients.close_clients()
+            assert first.is_closed
+            assert clients.get_http_client() is not first
+            await clients.close_clients()
+
+        asyncio.run(scenario())
+
+    def test_anthropic_client_reused_within_loop(self):
+        async def scenario():
+            first = clients.get_anthropic_client()
+            assert clients.get_anthropic_client() is first
+            await clients.close_clients()
+
+        asyncio.run(scenario())
+
+    def test_each_loop_gets_its_own_client(self):
+        async def grab():
+            client = clients.get_http_client()
+            await clients.close_clients()
+            return client
+
+        assert asyncio.run(grab()) is not asyncio.run(grab())
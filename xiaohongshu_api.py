@@ -15,10 +15,12 @@ class XiaohongshuAPI:
     def __init__(self, mcp_url: str = "http://localhost:18060/mcp"):
         self.mcp_url = mcp_url
         self.session_id = None
+        # 复用 HTTP 连接（keep-alive），避免每次请求重新建立 TCP 连接
+        self.http = requests.Session()
         
     def _init_session(self) -> str:
         """初始化 MCP 会话"""
-        response = requests.post(self.mcp_url, json={
+        response = self.http.post(self.mcp_url, json={
             "jsonrpc": "2.0",
             "id": 1,
             "method": "initialize",
@@ -32,7 +34,7 @@ class XiaohongshuAPI:
         self.session_id = response.headers.get('Mcp-Session-Id')
         
         # 发送初始化完成通知
-        requests.post(
+        self.http.post(
             self.mcp_url,
             headers={'Mcp-Session-Id': self.session_id},
             json={"jsonrpc": "2.0", "method": "notifications/initialized"}
@@ -46,7 +48,7 @@ class XiaohongshuAPI:
         if not self.session_id:
             self._init_session()
             
-        response = requests.post(
+        response = self.http.post(
             self.mcp_url,
             headers={'Mcp-Session-Id': self.session_id},
             json={
@@ -80,7 +82,7 @@ class XiaohongshuAPI:
         if not self.session_id:
             self._init_session()
             
-        response = requests.post(
+        response = self.http.post(
             self.mcp_url,
             headers={'Mcp-Session-Id': self.session_id},
             json={
@@ -124,7 +126,7 @@ class XiaohongshuAPI:
             self._init_session()
 
         try:
-            response = requests.post(
+            response = self.http.post(
                 self.mcp_url,
                 headers={'Mcp-Session-Id': self.session_id},
                 json={